@@ -0,0 +1,290 @@
+'''
+throughput benchmarks for name2nat
+'''
+import argparse
+import io
+import json
+import subprocess
+import sys
+import time
+
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from name2nat import Name2nat
+imported = time.perf_counter()
+my_name2nat = Name2nat(lazy={lazy})
+constructed = time.perf_counter()
+my_name2nat(["Kyubyong Park"], use_dict=False)
+predicted = time.perf_counter()
+print(json.dumps([imported - start, constructed - imported, predicted - constructed]))
+"""
+
+
+def load_names(path, limit):
+    names = open(path, "r", encoding="utf8").read().strip().splitlines()
+    if limit > 0:
+        names = names[:limit]
+    return names
+
+
+def check_same(reference, results, batch_size, tolerance=1e-5):
+    """Warn if a run predicts other labels or scores than the reference run"""
+    for (_, expected), (_, actual) in zip(reference, results):
+        same_labels = [label for label, _ in expected] == [label for label, _ in actual]
+        same_scores = all(abs(a[1] - b[1]) <= tolerance for a, b in zip(expected, actual))
+        if not (same_labels and same_scores):
+            print(f"warning: batch size {batch_size} changed the predictions")
+            return
+
+
+def bench_batch(hp):
+    """Names/sec of Name2nat.__call__ at several batch sizes"""
+    from name2nat import Name2nat
+
+    names = load_names(hp.src, hp.limit)
+    # Without the name dictionary, which may hold every test name
+    my_name2nat = Name2nat(dict_path=False)
+
+    baseline = None
+    reference = None
+    print(f"{len(names)} names from {hp.src}")
+    print("|Batch size|Seconds|Names/sec|Speedup|")
+    print("|--|--|--|--|")
+    for batch_size in hp.batch_sizes:
+        start = time.perf_counter()
+        results = my_name2nat(names, top_n=5, batch_size=batch_size, use_dict=False)
+        elapsed = time.perf_counter() - start
+        throughput = len(names) / elapsed
+        if baseline is None:
+            baseline = throughput
+            reference = results
+        else:
+            check_same(reference, results, batch_size)
+        print(f"|{batch_size}|{elapsed:.1f}|{throughput:.0f}|{throughput / baseline:.1f}x|")
+
+
+def bench_startup(hp):
+    """Seconds spent on import, construction and first prediction in a fresh process"""
+    print("|Mode|Import|Construct|First prediction|Total|")
+    print("|--|--|--|--|--|")
+    for lazy in (False, True):
+        timings = []
+        for _ in range(hp.repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT.format(lazy=lazy)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            timings.append(json.loads(output.strip().splitlines()[-1]))
+        # Report the fastest run of each phase to reduce noise
+        best = [min(phase) for phase in zip(*timings)]
+        mode = "lazy=True" if lazy else "lazy=False"
+        print(f"|{mode}|{best[0]:.2f}s|{best[1]:.2f}s|{best[2]:.2f}s|{sum(best):.2f}s|")
+
+
+def state_size(module):
+    """Megabytes of a torch module's serialized weights"""
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return buffer.tell() / 2**20
+
+
+def bench_quantize(hp):
+    """precision@1..5, names/sec and weight size of the int8 model against fp32"""
+    from eval import calc_precision, count_hits
+    from name2nat import Name2nat
+
+    names = load_names(hp.src, hp.limit)
+    gts = load_names(hp.gt, hp.limit)
+    assert len(names) == len(gts)
+
+    rows = []
+    for quantize in (None, "int8"):
+        my_name2nat = Name2nat(quantize=quantize, dict_path=False)
+        start = time.perf_counter()
+        results = my_name2nat(names, top_n=5, batch_size=hp.batch_size, use_dict=False)
+        elapsed = time.perf_counter() - start
+        preds = [",".join(label for label, _ in r[1]) for r in results]
+        precisions = [calc_precision(hits, len(gts)) for hits in count_hits(preds, gts)]
+        module = my_name2nat.classifier.module if quantize else my_name2nat.classifier
+        rows.append((quantize or "fp32", precisions, len(names) / elapsed, state_size(module)))
+
+    print(f"{len(names)} names from {hp.src}")
+    print("|Model|P@1|P@2|P@3|P@4|P@5|Names/sec|Weights (MB)|")
+    print("|--|--|--|--|--|--|--|--|")
+    for name, precisions, throughput, size in rows:
+        columns = "|".join(f"{p:.1f}" for p in precisions)
+        print(f"|{name}|{columns}|{throughput:.0f}|{size:.1f}|")
+    (_, fp32_p, fp32_tp, fp32_size), (_, int8_p, int8_tp, int8_size) = rows
+    deltas = "|".join(f"{b - a:+.1f}" for a, b in zip(fp32_p, int8_p))
+    print(f"|delta|{deltas}|{int8_tp / fp32_tp:.1f}x|{int8_size / fp32_size:.2f}x|")
+
+
+def bench_pool(hp):
+    """Names/sec of Name2natPool for several replica x thread splits of the cores"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from name2nat import Name2natPool
+
+    names = load_names(hp.src, hp.limit)
+    chunks = [names[i:i + hp.chunk_size] for i in range(0, len(names), hp.chunk_size)]
+    print(f"{len(names)} names from {hp.src}, {len(chunks)} chunks of up to {hp.chunk_size}")
+    print("|Replicas|Threads/replica|Seconds|Names/sec|Speedup|")
+    print("|--|--|--|--|--|")
+    baseline = None
+    for split in hp.splits:
+        replicas, threads = (int(n) for n in split.split("x"))
+        pool = Name2natPool(replicas=replicas, threads_per_replica=threads, dict_path=False)
+        # One client thread per replica keeps every replica busy
+        with ThreadPoolExecutor(replicas) as clients:
+            start = time.perf_counter()
+            list(clients.map(lambda chunk: pool(chunk, top_n=5, batch_size=hp.batch_size, use_dict=False),
+                             chunks))
+            elapsed = time.perf_counter() - start
+        throughput = len(names) / elapsed
+        baseline = baseline or throughput
+        print(f"|{replicas}|{threads}|{elapsed:.1f}|{throughput:.0f}|{throughput / baseline:.1f}x|")
+
+
+def time_training(char_ids, labels, indices, batch_size, steps, vocab_size, num_labels):
+    """
+    Samples/sec of steps training steps of a packed bidirectional GRU of
+    train.py's size (300-d embeddings and reprojection, 256 hidden units)
+    on indices cut into runs of batch_size, as a DataLoader does. The steps
+    are spread evenly over the epoch, so a sorted stream is not timed on
+    its shortest names only.
+    """
+    import torch
+    from torch.nn.utils.rnn import pack_padded_sequence, pad_sequence
+
+    torch.manual_seed(0)
+    embedding = torch.nn.Embedding(vocab_size, 300)
+    reproject = torch.nn.Linear(300, 300)
+    rnn = torch.nn.GRU(300, 256, batch_first=True, bidirectional=True)
+    decoder = torch.nn.Linear(512, num_labels)
+    modules = [embedding, reproject, rnn, decoder]
+    optimizer = torch.optim.SGD([p for module in modules for p in module.parameters()], lr=0.1)
+
+    import numpy as np
+
+    batches = [indices[i:i + batch_size] for i in range(0, len(indices), batch_size)]
+    batches = [batches[i] for i in np.unique(np.linspace(0, len(batches) - 1, steps).astype(int))]
+    samples = 0
+    start = time.perf_counter()
+    for batch in batches:
+        ids = pad_sequence([torch.from_numpy(char_ids[i]) for i in batch], batch_first=True)
+        lengths = torch.tensor([len(char_ids[i]) for i in batch])
+        packed = pack_padded_sequence(reproject(embedding(ids)), lengths, batch_first=True, enforce_sorted=False)
+        _, hidden = rnn(packed)
+        scores = decoder(torch.cat([hidden[0], hidden[1]], 1))
+        loss = torch.nn.functional.cross_entropy(scores, torch.from_numpy(labels[batch]), reduction="sum")
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        samples += len(batch)
+    return samples / (time.perf_counter() - start)
+
+
+def bench_padding(hp):
+    """Padding ratio and training samples/sec of shuffled, length-bucketed and length-sorted batches"""
+    import numpy as np
+
+    from name2nat.corpus import bucket_batches, padding_ratio, tokens
+
+    names = [tokens(name) for name in load_names(hp.src, hp.limit)]
+    chars = {}
+    char_ids = [np.array([chars.setdefault(char, len(chars)) for char in name], dtype=np.int64) for name in names]
+    lengths = np.array([len(name) for name in names])
+    # Labels only decide the decoder size; the loss cost does not depend on which is right
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, hp.num_labels, len(names))
+
+    # Every ordering is a flat index stream that is cut into runs of batch_size
+    orderings = [("shuffled (flair default)", rng.permutation(len(lengths)))]
+    for bucket_size in hp.bucket_sizes:
+        batches = bucket_batches(lengths, hp.batch_size, bucket_size, rng)
+        orderings.append((f"bucketed, {bucket_size} batches per pool", np.concatenate(batches)))
+    # Name2nat inference sorts all names of a call by length before batching
+    orderings.append(("sorted (inference)", np.argsort(lengths, kind="stable")))
+
+    print(f"{len(lengths)} names from {hp.src}, {lengths.min()}-{lengths.max()} characters, "
+          f"batch size {hp.batch_size}")
+    if hp.steps:
+        print(f"Samples/sec of {hp.steps} training steps of a bidirectional GRU of train.py's size")
+        print("|Batching|Padding|Samples/sec|Speedup|")
+        print("|--|--|--|--|")
+    else:
+        print("|Batching|Padding|")
+        print("|--|--|")
+    baseline = None
+    for name, indices in orderings:
+        padding = f"{100 * padding_ratio(lengths, indices, hp.batch_size):.1f}%"
+        if not hp.steps:
+            print(f"|{name}|{padding}|")
+            continue
+        throughput = time_training(char_ids, labels, indices, hp.batch_size, hp.steps, len(chars), hp.num_labels)
+        baseline = baseline or throughput
+        print(f"|{name}|{padding}|{throughput:.0f}|{throughput / baseline:.2f}x|")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="throughput per batch size")
+    batch_parser.add_argument("--src", type=str, default="nana_clean/country/test.src",
+                              help="names to predict (default: nana_clean/country/test.src)")
+    batch_parser.add_argument("--limit", type=int, default=0,
+                              help="only use the first N names (default: all)")
+    batch_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256, 1024],
+                              help="batch sizes to compare (default: 1 32 256 1024)")
+    batch_parser.set_defaults(func=bench_batch)
+
+    startup_parser = subparsers.add_parser("startup", help="import, construction and first prediction time")
+    startup_parser.add_argument("--repeat", type=int, default=3,
+                                help="fresh processes per mode (default: 3)")
+    startup_parser.set_defaults(func=bench_startup)
+
+    quantize_parser = subparsers.add_parser("quantize", help="int8 against fp32 accuracy and speed")
+    quantize_parser.add_argument("--src", type=str, default="nana_clean/country/test.src",
+                                 help="names to predict (default: nana_clean/country/test.src)")
+    quantize_parser.add_argument("--gt", type=str, default="nana_clean/country/test.tgt",
+                                 help="ground truth (default: nana_clean/country/test.tgt)")
+    quantize_parser.add_argument("--limit", type=int, default=0,
+                                 help="only use the first N names (default: all)")
+    quantize_parser.add_argument("--batch-size", type=int, default=256,
+                                 help="names per forward pass (default: 256)")
+    quantize_parser.set_defaults(func=bench_quantize)
+
+    pool_parser = subparsers.add_parser("pool", help="throughput per replica x thread split")
+    pool_parser.add_argument("--src", type=str, default="nana_clean/country/test.src",
+                             help="names to predict (default: nana_clean/country/test.src)")
+    pool_parser.add_argument("--limit", type=int, default=0,
+                             help="only use the first N names (default: all)")
+    pool_parser.add_argument("--splits", type=str, nargs="+", default=["1x32", "2x16", "4x8", "8x4", "16x2", "32x1"],
+                             help="REPLICASxTHREADS splits to compare (default: 1x32 2x16 4x8 8x4 16x2 32x1)")
+    pool_parser.add_argument("--chunk-size", type=int, default=2048,
+                             help="names per pool call (default: 2048)")
+    pool_parser.add_argument("--batch-size", type=int, default=256,
+                             help="names per forward pass (default: 256)")
+    pool_parser.set_defaults(func=bench_pool)
+
+    padding_parser = subparsers.add_parser("padding", help="padding ratio of length-bucketed batches")
+    padding_parser.add_argument("--src", type=str, default="nana_clean/country/test.src",
+                                help="names to batch (default: nana_clean/country/test.src)")
+    padding_parser.add_argument("--limit", type=int, default=0,
+                                help="only use the first N names (default: all)")
+    padding_parser.add_argument("--batch-size", type=int, default=128,
+                                help="names per batch (default: 128, train.py's mini-batch size)")
+    padding_parser.add_argument("--bucket-sizes", type=int, nargs="+", default=[10, 100, 1000],
+                                help="batches per length-sorted pool to compare (default: 10 100 1000)")
+    padding_parser.add_argument("--steps", type=int, default=0,
+                                help="also time this many training steps per batching (needs torch; default: 0)")
+    padding_parser.add_argument("--num-labels", type=int, default=200,
+                                help="decoder size of the timed model (default: 200)")
+    padding_parser.set_defaults(func=bench_padding)
+
+    hp = parser.parse_args()
+    hp.func(hp)
@@ -7,6 +7,16 @@ def calc_precision(hits, total):
     return 100 * round(hits / total, 3)
 
 
+def count_hits(preds, gts, max_k=5):
+    """Number of ground truths within the top 1..max_k of each comma separated prediction"""
+    hits = [0] * max_k
+    for pred, gt in zip(preds, gts):
+        columns = pred.split(",")
+        for k in range(max_k):
+            if gt in columns[:k + 1]: hits[k] += 1
+    return hits
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--gt", type=str, default="nana_clean/country/test.tgt",
@@ -20,18 +30,6 @@ if __name__ == "__main__":
 
     assert len(preds)==len(gts)
 
-    hits1, hits2, hits3, hits4, hits5 = 0, 0, 0, 0, 0
-    for pred, gt in zip(preds, gts):
-        columns = pred.split(",")
-        if gt in columns[:1]: hits1 += 1
-        if gt in columns[:2]: hits2 += 1
-        if gt in columns[:3]: hits3 += 1
-        if gt in columns[:4]: hits4 += 1
-        if gt in columns[:5]: hits5 += 1
-
-    print("precision@1={}/{}={}".format(hits1, len(gts), calc_precision(hits1, len(gts))))
-    print("precision@2={}/{}={}".format(hits2, len(gts), calc_precision(hits2, len(gts))))
-    print("precision@3={}/{}={}".format(hits3, len(gts), calc_precision(hits3, len(gts))))
-    print("precision@4={}/{}={}".format(hits4, len(gts), calc_precision(hits4, len(gts))))
-    print("precision@5={}/{}={}".format(hits5, len(gts), calc_precision(hits5, len(gts))))
-
+    hits = count_hits(preds, gts)
+    for k, hits_k in enumerate(hits, 1):
+        print("precision@{}={}/{}={}".format(k, hits_k, len(gts), calc_precision(hits_k, len(gts))))
@@ -3,4 +3,5 @@ r"""name2nat
 """
 from __future__ import absolute_import
 
-from .name2nat import Name2nat
\ No newline at end of file
+from .name2nat import Name2nat
+from .pool import Name2natPool
@@ -0,0 +1,161 @@
+"""Inference backends that run exported models instead of the flair classifier.
+
+All backends take converted (space separated) names, sort them by length,
+pad them into batches of character ids and return an N x C float32 matrix
+of label probabilities in label dictionary order. Given label_ids, they
+return the distribution renormalized over those labels only.
+"""
+import json
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class CharClassifier(ABC):
+    """Character encoding and length-sorted batching shared by the backends"""
+
+    def __init__(self, chars, labels):
+        self.chars = [str(char) for char in chars]
+        self.labels = [str(label) for label in labels]
+        self.char_index = {char: i for i, char in enumerate(self.chars)}
+        self.unk_index = self.char_index.get("<unk>", 0)
+
+    def encode(self, name):
+        """Character ids of a converted (space separated) name"""
+        return [self.char_index.get(char, self.unk_index) for char in name.split()]
+
+    def predict_proba(self, names, batch_size=256, label_ids=None):
+        """
+        N x C float32 label probabilities of converted names, or N x K
+        probabilities renormalized over the K labels of label_ids
+        """
+        ids = [self.encode(name) for name in names]
+        num_labels = len(self.labels) if label_ids is None else len(label_ids)
+        probs = np.zeros((len(names), num_labels), dtype=np.float32)
+        # Sort by length so each batch is padded to similar lengths only
+        order = sorted((i for i in range(len(ids)) if ids[i]), key=lambda i: len(ids[i]))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            probs[batch] = self.forward(*pad([ids[i] for i in batch]), label_ids=label_ids)
+        return probs
+
+    @abstractmethod
+    def forward(self, ids, lengths, label_ids=None):
+        """Probabilities of a padded B x T batch of character ids"""
+
+
+def restrict(probs, label_ids):
+    """Probabilities of the label_ids columns, renormalized to sum to 1"""
+    if label_ids is None:
+        return probs
+    probs = probs[:, label_ids]
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def top_k(vectors, k):
+    """
+    Label indices and probabilities of the k most probable labels of each
+    probability vector, most probable first, as nested Python lists.
+    Selection runs on the stacked N x C matrix, so only the returned
+    entries become Python objects.
+    """
+    if not vectors or k <= 0:
+        return [[] for _ in vectors], [[] for _ in vectors]
+    probs = np.stack([np.asarray(vector, dtype=np.float32) for vector in vectors])
+    k = min(k, probs.shape[1])
+    top = np.argpartition(-probs, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(probs, top, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    return top.tolist(), scores.tolist()
+
+
+def pad(batch):
+    """Right-pad character id lists into a B x T int64 matrix plus their lengths"""
+    lengths = np.array([len(ids) for ids in batch], dtype=np.int64)
+    padded = np.zeros((len(batch), lengths.max()), dtype=np.int64)
+    for i, ids in enumerate(batch):
+        padded[i, :len(ids)] = ids
+    return padded, lengths
+
+
+class TorchClassifier(CharClassifier):
+    """Runs a torch module mapping (ids, lengths) to probabilities, see export.classifier_core"""
+
+    def __init__(self, module, chars, labels):
+        super().__init__(chars, labels)
+        self.module = module.eval()
+
+    @classmethod
+    def from_flair(cls, classifier, quantize=None):
+        """
+        Rebuild a flair TextClassifier as a torch module. With quantize="int8"
+        the GRU and Linear layers are dynamically quantized to int8.
+        """
+        import torch
+
+        from name2nat.export import classifier_arrays, classifier_core
+
+        arrays = classifier_arrays(classifier)
+        module = classifier_core(arrays)
+        if quantize == "int8":
+            module = torch.ao.quantization.quantize_dynamic(
+                module, {torch.nn.GRU, torch.nn.Linear}, dtype=torch.qint8
+            )
+        elif quantize is not None:
+            raise ValueError(f"quantize must be None or 'int8', got {quantize!r}")
+        return cls(module, arrays["chars"], arrays["labels"])
+
+    def forward(self, ids, lengths, label_ids=None):
+        import torch
+
+        # The module computes the full softmax; label_ids only renormalize its output
+        with torch.inference_mode():
+            return restrict(self.module(torch.from_numpy(ids), torch.from_numpy(lengths)).numpy(), label_ids)
+
+    def save(self, path):
+        """Script the module and save it with its dictionaries, for TorchScriptClassifier"""
+        import torch
+
+        module = torch.jit.script(self.module)
+        module = torch.jit.optimize_for_inference(torch.jit.freeze(module))
+        torch.jit.save(module, path, _extra_files={
+            "chars.json": json.dumps(self.chars),
+            "labels.json": json.dumps(self.labels),
+        })
+
+
+class TorchScriptClassifier(TorchClassifier):
+    """Runs a TorchScript export made by `python -m name2nat.export --format torchscript`"""
+
+    @classmethod
+    def load(cls, path):
+        import torch
+
+        extra_files = {"chars.json": "", "labels.json": ""}
+        module = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+        return cls(module, json.loads(extra_files["chars.json"]), json.loads(extra_files["labels.json"]))
+
+
+class OnnxClassifier(CharClassifier):
+    """Runs an ONNX export made by `python -m name2nat.export --format onnx` with onnxruntime"""
+
+    def __init__(self, path):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        super().__init__(json.loads(metadata["chars"]), json.loads(metadata["labels"]))
+
+    @classmethod
+    def load(cls, path):
+        return cls(path)
+
+    def forward(self, ids, lengths, label_ids=None):
+        # The graph computes the full softmax; label_ids only renormalize its output
+        return restrict(self.session.run(["probs"], {"ids": ids, "lengths": lengths})[0], label_ids)
@@ -0,0 +1,141 @@
+"""Dynamic micro-batching of concurrent asyncio prediction requests."""
+import asyncio
+import functools
+import time
+from collections import Counter, deque
+
+
+class MicroBatcher:
+    """
+    Queues names from concurrent coroutines and runs them through predict,
+    a Name2nat or a function with the same signature, in shared batches. A batch is started as soon as
+    max_batch_size names are waiting, or max_wait seconds after its first
+    name arrived. Batches run one at a time in executor (the loop's
+    default thread pool if None), so the event loop is never blocked by
+    a forward pass.
+    """
+
+    LATENCY_WINDOW = 10000  # most recent request latencies kept for percentiles
+
+    def __init__(self, predict, max_batch_size=256, max_wait=0.005, executor=None):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        if max_wait < 0:
+            raise ValueError("max_wait must not be negative")
+        self.predict_fn = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.names = 0
+
+    async def predict(self, names, top_n=5, use_dict=True):
+        """(name, [(label, score), ...]) of each name, as Name2nat.__call__ returns them"""
+        if not isinstance(names, list):
+            names = [names]
+        start = time.perf_counter()
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for name in names:
+            future = loop.create_future()
+            self._queue.put_nowait((name, top_n, use_dict, future))
+            futures.append(future)
+        results = await asyncio.gather(*futures)
+        self.latencies.append(time.perf_counter() - start)
+        self.requests += 1
+        self.names += len(names)
+        return results
+
+    def _ensure_worker(self):
+        # Created on first use inside the running event loop, and again
+        # if a later caller runs in another loop (e.g. repeated asyncio.run)
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            # A worker of a loop that is gone can only be dropped
+            if self._loop is asyncio.get_running_loop():
+                try:
+                    await self._worker
+                except asyncio.CancelledError:
+                    pass
+            self._worker = None
+            self._loop = None
+
+    async def _next_batch(self):
+        """Wait for a first item, then collect more until the batch is full or max_wait passed"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                # Still take whatever is already waiting
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            self.batch_sizes[len(batch)] += 1
+            # One model call per use_dict setting; longer top-n lists are cut per caller
+            for use_dict in (True, False):
+                items = [item for item in batch if item[2] == use_dict]
+                if not items:
+                    continue
+                top_n = max(item[1] for item in items)
+                try:
+                    predict = functools.partial(
+                        self.predict_fn, [item[0] for item in items],
+                        top_n=top_n, batch_size=self.max_batch_size, use_dict=use_dict,
+                    )
+                    results = await loop.run_in_executor(self.executor, predict)
+                except Exception as e:
+                    for *_, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, item_top_n, _, future), (name, predictions) in zip(items, results):
+                    if not future.done():
+                        future.set_result((name, predictions[:item_top_n]))
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))]
+
+        # Batch sizes in power-of-two buckets: "1", "2-3", "4-7", ...
+        histogram = Counter()
+        for size, count in self.batch_sizes.items():
+            low = 1 << (size.bit_length() - 1)
+            high = 2 * low - 1
+            histogram[str(low) if low == high else f"{low}-{high}"] += count
+        return {
+            "requests": self.requests,
+            "names": self.names,
+            "batches": sum(self.batch_sizes.values()),
+            "max_batch_size": self.max_batch_size,
+            "max_wait": self.max_wait,
+            "latency_ms": {f"p{q}": 1000 * percentile(q) for q in (50, 90, 99)},
+            "batch_size_histogram": dict(sorted(histogram.items(), key=lambda item: int(item[0].split("-")[0]))),
+        }
@@ -0,0 +1,142 @@
+"""Prediction caches keyed by the converted name."""
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded, thread-safe least-recently-used cache of probability vectors"""
+
+    def __init__(self, maxsize=100000):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys that are cached"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._data.get(key)
+                if value is None:
+                    self.misses += 1
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+                self.hits += 1
+        return found
+
+    def put_many(self, items):
+        """Insert {key: value}, evicting the least recently used entries"""
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SqliteCache:
+    """
+    Persistent cache of probability vectors in a local SQLite file.
+    Entries are keyed by model hash and converted name, so a retrained
+    model never reads stale predictions. The database runs in WAL mode,
+    so many worker processes can read while one writes.
+    """
+
+    CHUNK_SIZE = 500  # stays below SQLite's limit on bound parameters
+
+    def __init__(self, path, model_hash):
+        self.path = path
+        self.model_hash = model_hash
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "model TEXT NOT NULL, name TEXT NOT NULL, probs BLOB NOT NULL, "
+                "PRIMARY KEY (model, name)) WITHOUT ROWID"
+            )
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys that are cached"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), self.CHUNK_SIZE):
+                chunk = keys[start:start + self.CHUNK_SIZE]
+                rows = self._conn.execute(
+                    "SELECT name, probs FROM predictions WHERE model = ? AND name IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    [self.model_hash] + chunk,
+                )
+                for name, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[name] = vector
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Insert {key: value} in a single transaction"""
+        rows = [(self.model_hash, key, value.tobytes()) for key, value in items.items()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO predictions (model, name, probs) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def file_hash(path, length=16):
+    """Short sha256 hex digest of a file, used to tell model versions apart"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:length]
@@ -0,0 +1,116 @@
+"""The `name2nat` command: predict nationalities of names streamed from files or stdin.
+
+    name2nat names.txt > names.tsv
+    zcat export.txt.gz | name2nat --format jsonl --top-n 3 > export.jsonl
+    name2nat --parquet-column author papers.parquet -o scored.parquet
+
+Input is one name per line. Names are read and predicted in chunks, and
+each chunk's results are written before the next one is read, so memory
+stays constant no matter how many names are piped through.
+"""
+import argparse
+import json
+import os
+import sys
+
+FORMATS = ("tsv", "jsonl")
+
+
+def read_names(paths):
+    """Names of the files in paths, one per line ('-' reads stdin)"""
+    for path in paths:
+        if path == "-":
+            f = sys.stdin
+        else:
+            f = open(path, "r", encoding="utf8")
+        try:
+            for line in f:
+                yield line.rstrip("\r\n")
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def format_tsv(name, predictions):
+    """name, then label and probability of each prediction, tab separated"""
+    fields = [name.replace("\t", " ")]
+    for label, score in predictions:
+        fields += [label, f"{score:.6f}"]
+    return "\t".join(fields)
+
+
+def format_jsonl(name, predictions):
+    return json.dumps(
+        {"name": name, "predictions": [[label, round(score, 6)] for label, score in predictions]},
+        ensure_ascii=False,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="name2nat",
+        description="Predict the nationalities of names, one name per input line",
+    )
+    parser.add_argument("files", nargs="*", default=["-"],
+                        help="files with one name per line (default: stdin, '-' also reads stdin)")
+    parser.add_argument("-o", "--output", type=str, default="-",
+                        help="output file (default: stdout)")
+    parser.add_argument("--format", type=str, choices=FORMATS, default="tsv",
+                        help="tsv: name, then label and probability columns; "
+                             "jsonl: one JSON object per name (default: tsv)")
+    parser.add_argument("--top-n", type=int, default=5,
+                        help="number of predictions per name (default: 5)")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="names per forward pass (default: 256)")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="names read and written at a time; bounds memory use (default: 10000)")
+    parser.add_argument("--no-dict", action="store_true",
+                        help="predict every name with the model instead of the Wikipedia name dictionary")
+    parser.add_argument("--backend", type=str, default="flair",
+                        help="flair, numpy, torchscript or onnx (default: flair)")
+    parser.add_argument("--model", type=str, default=None,
+                        help="model file (default: the backend's model next to the package)")
+    parser.add_argument("--cache", type=str, default=None,
+                        help="SQLite prediction cache shared across runs (default: none)")
+    parser.add_argument("--parquet-column", type=str, default=None,
+                        help="read a Parquet file instead and add top-n label_K/prob_K columns for "
+                             "the names in this column; -o names the output Parquet file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    hp = parse_args(argv)
+    if hp.chunk_size <= 0:
+        raise SystemExit("name2nat: --chunk-size must be positive")
+
+    from name2nat import Name2nat
+
+    my_name2nat = Name2nat(model_path=hp.model, backend=hp.backend, cache_path=hp.cache)
+    if hp.parquet_column:
+        if len(hp.files) != 1 or hp.files[0] == "-" or hp.output == "-":
+            raise SystemExit("name2nat: --parquet-column needs one input file and an -o output file")
+        my_name2nat.predict_column(hp.files[0], hp.parquet_column, output=hp.output, top_n=hp.top_n,
+                                   batch_size=hp.batch_size, use_dict=not hp.no_dict,
+                                   chunk_size=hp.chunk_size)
+        return
+
+    format_line = format_tsv if hp.format == "tsv" else format_jsonl
+
+    out = sys.stdout if hp.output == "-" else open(hp.output, "w", encoding="utf8")
+    try:
+        results = my_name2nat.iter_predict(read_names(hp.files), top_n=hp.top_n, batch_size=hp.batch_size,
+                                           use_dict=not hp.no_dict, chunk_size=hp.chunk_size)
+        for name, predictions in results:
+            # Write the names as given, not in the model's converted form
+            out.write(format_line(my_name2nat.restore(name), predictions) + "\n")
+    except BrokenPipeError:
+        # The reader went away, e.g. `name2nat names.txt | head`; point
+        # stdout at devnull so the interpreter does not fail flushing it
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
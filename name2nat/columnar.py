@@ -0,0 +1,120 @@
+"""Arrow, Parquet and pandas input and output of Name2nat.
+
+    probs, labels = my_name2nat.predict_matrix(names)
+    write_parquet("names.parquet", probs, labels, names=names)
+
+The table has an optional "name" column followed by one float32 column
+per label. predict_column() scores a name column of a DataFrame or a
+Parquet file chunk by chunk and adds top-n label and probability columns.
+Needs pyarrow (pip install name2nat[arrow]), and pandas for DataFrames.
+"""
+import sys
+import time
+
+
+def to_arrow(probs, labels, names=None):
+    """pyarrow Table of an N x C probability matrix, one column per label"""
+    import numpy as np
+    import pyarrow as pa
+
+    if probs.ndim != 2 or probs.shape[1] != len(labels):
+        raise ValueError(f"probs must be N x {len(labels)}, got shape {probs.shape}")
+    columns = {}
+    if names is not None:
+        if len(names) != len(probs):
+            raise ValueError(f"got {len(names)} names for {len(probs)} rows")
+        columns["name"] = pa.array(names, type=pa.string())
+    # Transpose once, so each label column is a contiguous slice
+    by_label = np.ascontiguousarray(probs.T, dtype=np.float32)
+    for label, column in zip(labels, by_label):
+        columns[str(label)] = pa.array(column)
+    return pa.table(columns)
+
+
+def write_parquet(path, probs, labels, names=None, **kwargs):
+    """Write to_arrow() as a Parquet file; kwargs go to pyarrow.parquet.write_table"""
+    import pyarrow.parquet as pq
+
+    pq.write_table(to_arrow(probs, labels, names), path, **kwargs)
+
+
+def score_chunk(name2nat, names, top_n=5, batch_size=256, use_dict=True):
+    """
+    Top-n columns of a chunk of names: {"label_1": [...], "prob_1": [...], ...}.
+    Each distinct name of the chunk is predicted once; missing names and
+    names without predictions get None and NaN.
+    """
+    import numpy as np
+
+    # Missing values are None in Arrow and NaN in pandas
+    names = [name if isinstance(name, str) else "" for name in names]
+    unique = list(dict.fromkeys(names))
+    predictions = dict(zip(unique, (p for _, p in name2nat(unique, top_n=top_n, batch_size=batch_size,
+                                                              use_dict=use_dict))))
+    columns = {}
+    for k in range(top_n):
+        labels = [None] * len(names)
+        probs = np.full(len(names), np.nan, dtype=np.float32)
+        for i, name in enumerate(names):
+            ranked = predictions[name]
+            if k < len(ranked):
+                labels[i], probs[i] = ranked[k]
+        columns[f"label_{k + 1}"] = labels
+        columns[f"prob_{k + 1}"] = probs
+    return columns, len(unique)
+
+
+def predict_column(name2nat, source, column="name", output=None, top_n=5, batch_size=256,
+                   use_dict=True, chunk_size=65536, verbose=True):
+    """
+    Score the names in a column of a pandas DataFrame or a Parquet file,
+    chunk_size rows at a time, see Name2nat.predict_column.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    start = time.perf_counter()
+    rows = unique = 0
+
+    if isinstance(source, str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if output is None:
+            raise ValueError("scoring a Parquet file needs an output path")
+        parquet_file = pq.ParquetFile(source)
+        schema = parquet_file.schema_arrow
+        for k in range(1, top_n + 1):
+            schema = schema.append(pa.field(f"label_{k}", pa.string()))
+            schema = schema.append(pa.field(f"prob_{k}", pa.float32()))
+        # Created up front, so a file without rows still gives a valid, empty output
+        with pq.ParquetWriter(output, schema) as writer:
+            for batch in parquet_file.iter_batches(batch_size=chunk_size):
+                scores, chunk_unique = score_chunk(name2nat, batch.column(column).to_pylist(),
+                                                   top_n, batch_size, use_dict)
+                arrays = batch.columns + [pa.array(values, type=schema.field(name).type)
+                                          for name, values in scores.items()]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                rows += batch.num_rows
+                unique += chunk_unique
+        result = output
+    else:
+        import pandas as pd
+
+        result = source.copy()
+        values = source[column]
+        parts = []
+        for begin in range(0, len(values), chunk_size):
+            names = values.iloc[begin:begin + chunk_size].tolist()
+            scores, chunk_unique = score_chunk(name2nat, names, top_n, batch_size, use_dict)
+            parts.append(pd.DataFrame(scores, index=values.index[begin:begin + chunk_size]))
+            rows += len(names)
+            unique += chunk_unique
+        if parts:
+            for name, scored in pd.concat(parts).items():
+                result[name] = scored
+
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f"Scored {rows} names ({unique} distinct within their chunks) in {elapsed:.1f}s, "
+              f"{rows / elapsed if elapsed else 0:.0f} names/sec", file=sys.stderr)
+    return result
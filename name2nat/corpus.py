@@ -0,0 +1,215 @@
+"""Pre-tokenized training corpus stored as memory-mapped NumPy arrays.
+
+A cache directory holds vocab.json (the character and label lists), a
+manifest of the input files it was built from, and one directory per
+split with
+
+    ids.npy      uint16 character ids of all names, concatenated
+    offsets.npy  int64[count + 1]; name i is ids[offsets[i]:offsets[i + 1]]
+    labels.npy   uint16 label id of each name
+
+Names are encoded like train.py's flair format: spaces become "▁" and
+every character is a token. Splits are opened with mmap_mode="r", so
+reading a name touches only its own bytes.
+
+    python -m name2nat.corpus --out data/corpus
+"""
+import argparse
+import json
+import os
+from array import array
+
+import numpy as np
+
+FORMAT_VERSION = 1
+SPACE = "▁"
+
+
+def tokens(name):
+    """Character tokens of a name, as in Name2nat.convert"""
+    return list(name.replace(" ", SPACE))
+
+
+def read_lines(src_file, tgt_file):
+    """Yield (name, label) of a .src/.tgt file pair, one per line"""
+    with open(src_file, "r", encoding="utf8") as fsrc, open(tgt_file, "r", encoding="utf8") as ftgt:
+        for name, label in zip(fsrc, ftgt):
+            name, label = name.rstrip("\r\n"), label.strip()
+            if name.strip() and label:
+                yield name, label
+
+
+def manifest(sources):
+    """What a cache of sources is built from: the format and a hash of each input file"""
+    from name2nat.cache import file_hash
+
+    return {
+        "version": FORMAT_VERSION,
+        "splits": {
+            split: [[src, tgt, file_hash(src), file_hash(tgt)] for src, tgt in pairs]
+            for split, pairs in sources.items()
+        },
+    }
+
+
+def build(sources, cache_dir):
+    """
+    Encode {split: [(src_file, tgt_file), ...]} into cache_dir.
+    The characters and labels of all splits share one vocabulary.
+    Returns {split: number of names}.
+    """
+    chars = {}
+    labels = {}
+    counts = {}
+    for split, pairs in sources.items():
+        ids = array("I")
+        offsets = array("q", [0])
+        label_ids = array("H")
+        for src_file, tgt_file in pairs:
+            for name, label in read_lines(src_file, tgt_file):
+                ids.extend(chars.setdefault(char, len(chars)) for char in tokens(name))
+                offsets.append(len(ids))
+                label_ids.append(labels.setdefault(label, len(labels)))
+
+        if len(chars) > 2**16:
+            raise ValueError(f"{len(chars)} distinct characters do not fit uint16 ids")
+        split_dir = os.path.join(cache_dir, split)
+        os.makedirs(split_dir, exist_ok=True)
+        np.save(os.path.join(split_dir, "ids.npy"), np.frombuffer(ids, dtype=np.uint32).astype(np.uint16))
+        np.save(os.path.join(split_dir, "offsets.npy"), np.frombuffer(offsets, dtype=np.int64))
+        np.save(os.path.join(split_dir, "labels.npy"), np.frombuffer(label_ids, dtype=np.uint16))
+        counts[split] = len(label_ids)
+
+    with open(os.path.join(cache_dir, "vocab.json"), "w", encoding="utf8") as f:
+        json.dump({"chars": list(chars), "labels": list(labels)}, f, ensure_ascii=False)
+    return counts
+
+
+def ensure(sources, cache_dir):
+    """
+    Build cache_dir unless it was already built from the same format and
+    input files. Raises FileNotFoundError if an input file is missing and
+    ValueError if a split has no names.
+    """
+    for split, pairs in sources.items():
+        for src, tgt in pairs:
+            for path in (src, tgt):
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"{path} ({split} split) not found")
+    expected = manifest(sources)
+    manifest_file = os.path.join(cache_dir, "manifest.json")
+    try:
+        with open(manifest_file, "r", encoding="utf8") as f:
+            if json.load(f) == expected:
+                return False
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+    counts = build(sources, cache_dir)
+    empty = [split for split, count in counts.items() if not count]
+    if empty:
+        raise ValueError(f"no names in the {', '.join(empty)} split of {cache_dir}")
+    with open(manifest_file, "w", encoding="utf8") as f:
+        json.dump(expected, f, indent=2)
+    print(f"Encoded {counts} names into {cache_dir}")
+    return True
+
+
+class EncodedSplit:
+    """One memory-mapped split of an encoded corpus"""
+
+    def __init__(self, cache_dir, split):
+        with open(os.path.join(cache_dir, "vocab.json"), "r", encoding="utf8") as f:
+            vocab = json.load(f)
+        self.chars = vocab["chars"]
+        self.labels = vocab["labels"]
+        split_dir = os.path.join(cache_dir, split)
+        self.ids = np.load(os.path.join(split_dir, "ids.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(split_dir, "offsets.npy"), mmap_mode="r")
+        self.label_ids = np.load(os.path.join(split_dir, "labels.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.label_ids)
+
+    def char_ids(self, i):
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def tokens(self, i):
+        """Character tokens of name i"""
+        return [self.chars[char_id] for char_id in self.char_ids(i).tolist()]
+
+    def lengths(self):
+        """Number of characters of every name"""
+        return np.diff(self.offsets)
+
+    def label(self, i):
+        return self.labels[self.label_ids[i]]
+
+    def used_chars(self):
+        """The characters that occur in this split, in vocabulary order"""
+        return [self.chars[char_id] for char_id in np.unique(self.ids).tolist()]
+
+
+def bucket_batches(lengths, batch_size, bucket_size=100, rng=None):
+    """
+    Shuffled batches of indices whose names have similar lengths.
+    Indices are shuffled, cut into pools of bucket_size batches, sorted by
+    length within each pool and split into batches; the order of the full
+    batches is shuffled again and the one short batch comes last, so that
+    the concatenated indices cut into batch_size runs (as a DataLoader
+    does) give back the same batches. A new rng state gives a new
+    grouping every epoch.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    lengths = np.asarray(lengths)
+    order = rng.permutation(len(lengths))
+    pool_size = batch_size * bucket_size
+    batches = []
+    for start in range(0, len(order), pool_size):
+        pool = order[start:start + pool_size]
+        pool = pool[np.argsort(lengths[pool], kind="stable")]
+        batches.extend(pool[i:i + batch_size] for i in range(0, len(pool), batch_size))
+    short = [batches.pop()] if batches and len(batches[-1]) < batch_size else []
+    return [batches[i] for i in rng.permutation(len(batches))] + short
+
+
+def padding_ratio(lengths, indices, batch_size):
+    """
+    Fraction of padded steps when indices are cut into consecutive runs of
+    batch_size, as a DataLoader forms mini-batches, and every batch is
+    padded to its longest name
+    """
+    lengths = np.asarray(lengths)[np.asarray(indices, dtype=np.int64)]
+    if not len(lengths):
+        return 0.0
+    longest = np.maximum.reduceat(lengths, np.arange(0, len(lengths), batch_size))
+    sizes = np.diff(np.append(np.arange(0, len(lengths), batch_size), len(lengths)))
+    return 1 - int(lengths.sum()) / int((longest * sizes).sum())
+
+
+def training_sources(data_dir="nana_clean/country", everything=False):
+    """train.py's splits: train (+ dev and test with everything) and ODI data, and dev"""
+    train_splits = ["train", "dev", "test"] if everything else ["train"]
+    train = [(os.path.join(data_dir, f"{split}.src"), os.path.join(data_dir, f"{split}.tgt"))
+             for split in train_splits]
+    train.append((os.path.join(data_dir, "odi.country.src"), os.path.join(data_dir, "odi.country.tgt")))
+    dev = [(os.path.join(data_dir, "dev.src"), os.path.join(data_dir, "dev.tgt"))]
+    return {"train": train, "dev": dev}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encode the training corpus for train.py")
+    parser.add_argument("--data-dir", type=str, default="nana_clean/country",
+                        help="directory with the .src/.tgt splits (default: nana_clean/country)")
+    parser.add_argument("--everything", action="store_true",
+                        help="also train on dev and test, as train.py --everything")
+    parser.add_argument("--out", type=str, default=None,
+                        help="cache directory (default: data/corpus or data/corpus-everything)")
+    hp = parser.parse_args()
+
+    out = hp.out or ("data/corpus-everything" if hp.everything else "data/corpus")
+    if not ensure(training_sources(hp.data_dir, hp.everything), out):
+        print(f"{out} is up to date")
@@ -0,0 +1,133 @@
+"""Exact-match name dictionary stored as a sorted, memory-mapped index.
+
+File layout (all integers are little-endian uint32):
+
+    magic | count | offsets[count + 1] | records
+
+Record i is ``data[offsets[i]:offsets[i + 1]]`` and holds ``name\\tlabel``
+encoded as utf-8. Records are sorted by name bytes, so a lookup is a binary
+search over the mapped file and nothing is loaded into Python objects.
+"""
+import argparse
+import mmap
+import os
+import sys
+from array import array
+from collections import Counter
+
+MAGIC = b"N2ND"
+HEADER_SIZE = 8
+
+
+def normalize(name):
+    """Dictionary key of a name: surrounding and repeated whitespace removed"""
+    return " ".join(name.split())
+
+
+class NameDict:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != MAGIC:
+            raise ValueError(f"{path} is not a name2nat dictionary")
+
+        self._count = int.from_bytes(self._mmap[4:HEADER_SIZE], "little")
+        offsets_end = HEADER_SIZE + 4 * (self._count + 1)
+        if sys.byteorder == "little":
+            self._offsets = memoryview(self._mmap)[HEADER_SIZE:offsets_end].cast("I")
+        else:
+            self._offsets = array("I", self._mmap[HEADER_SIZE:offsets_end])
+            self._offsets.byteswap()
+        self._data_start = offsets_end
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def _record(self, i):
+        start = self._data_start + self._offsets[i]
+        end = self._data_start + self._offsets[i + 1]
+        return self._mmap[start:end]
+
+    def get(self, name):
+        """Return the label of a name, or None if it is not in the dictionary"""
+        key = normalize(name).encode("utf8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record_key, label = self._record(mid).split(b"\t", 1)
+            if record_key == key:
+                return label.decode("utf8")
+            if record_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def close(self):
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._mmap.close()
+
+
+def read_pairs(data_dir, splits=("train", "dev", "test")):
+    """Yield (name, label) from the {split}.src/{split}.tgt files in data_dir"""
+    for split in splits:
+        src_file = os.path.join(data_dir, f"{split}.src")
+        tgt_file = os.path.join(data_dir, f"{split}.tgt")
+        if not (os.path.exists(src_file) and os.path.exists(tgt_file)):
+            print(f"Skipping {split}: {src_file} or {tgt_file} not found")
+            continue
+        with open(src_file, "r", encoding="utf8") as fsrc, open(tgt_file, "r", encoding="utf8") as ftgt:
+            for name, label in zip(fsrc, ftgt):
+                yield name.strip(), label.strip()
+
+
+def build(pairs, path):
+    """
+    Write a dictionary file from (name, label) pairs.
+    A name seen with several labels keeps its most frequent one.
+    Returns the number of names written.
+    """
+    counts = {}
+    for name, label in pairs:
+        key = normalize(name)
+        if key and label:
+            counts.setdefault(key, Counter())[label] += 1
+
+    keys = sorted(counts, key=lambda key: key.encode("utf8"))
+    offsets = array("I", [0])
+    with open(path + ".tmp", "wb") as fout:
+        records = bytearray()
+        for key in keys:
+            label = counts[key].most_common(1)[0][0]
+            records += key.encode("utf8") + b"\t" + label.encode("utf8")
+            offsets.append(len(records))
+
+        header = array("I", [len(keys)])
+        if sys.byteorder != "little":
+            header.byteswap()
+            offsets.byteswap()
+        fout.write(MAGIC)
+        fout.write(header.tobytes())
+        fout.write(offsets.tobytes())
+        fout.write(records)
+    os.replace(path + ".tmp", path)
+    return len(keys)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the name2nat name dictionary")
+    parser.add_argument("data_dirs", type=str, nargs="*", default=["nana_clean/country"],
+                        help="directories with {train,dev,test}.src/.tgt (default: nana_clean/country)")
+    parser.add_argument("--out", type=str,
+                        default=os.path.join(os.path.dirname(__file__), "name2nats.idx"),
+                        help="output file (default: name2nat/name2nats.idx)")
+    hp = parser.parse_args()
+
+    pairs = (pair for data_dir in hp.data_dirs for pair in read_pairs(data_dir))
+    count = build(pairs, hp.out)
+    print(f"Wrote {count} names to {hp.out} ({os.path.getsize(hp.out) / 2**20:.1f} MB)")
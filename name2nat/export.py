@@ -0,0 +1,195 @@
+"""Export the flair classifier for inference without flair.
+
+    python -m name2nat.export --format numpy
+    python -m name2nat.export --format torchscript
+    python -m name2nat.export --format onnx
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+
+def classifier_arrays(classifier):
+    """Weights and dictionaries of a flair TextClassifier as float32 NumPy arrays"""
+    document_embeddings = classifier.embeddings
+    rnn = document_embeddings.rnn
+    if rnn.mode != "GRU" or rnn.num_layers != 1 or not rnn.bidirectional:
+        raise ValueError("only single-layer bidirectional GRU classifiers can be exported")
+    char_embeddings = document_embeddings.embeddings.embeddings
+    if len(char_embeddings) != 1:
+        raise ValueError("only classifiers with a single OneHotEmbeddings can be exported")
+    one_hot = char_embeddings[0]
+
+    def numpy(tensor):
+        return tensor.detach().cpu().float().numpy()
+
+    embedding = numpy(one_hot.embedding_layer.weight)
+    if getattr(document_embeddings, "reproject_words", False):
+        reproj_w = numpy(document_embeddings.word_reprojection_map.weight)
+        reproj_b = numpy(document_embeddings.word_reprojection_map.bias)
+    else:
+        reproj_w = np.eye(embedding.shape[1], dtype=np.float32)
+        reproj_b = np.zeros(embedding.shape[1], dtype=np.float32)
+
+    arrays = {
+        "chars": np.array(one_hot.vocab_dictionary.get_items()),
+        "labels": np.array(classifier.label_dictionary.get_items()),
+        "embedding": embedding,
+        "reproj_w": reproj_w,
+        "reproj_b": reproj_b,
+        "decoder_w": numpy(classifier.decoder.weight),
+        "decoder_b": numpy(classifier.decoder.bias),
+    }
+    for direction, suffix in (("forward", ""), ("backward", "_reverse")):
+        arrays[f"{direction}_w_ih"] = numpy(getattr(rnn, f"weight_ih_l0{suffix}"))
+        arrays[f"{direction}_w_hh"] = numpy(getattr(rnn, f"weight_hh_l0{suffix}"))
+        arrays[f"{direction}_b_ih"] = numpy(getattr(rnn, f"bias_ih_l0{suffix}"))
+        arrays[f"{direction}_b_hh"] = numpy(getattr(rnn, f"bias_hh_l0{suffix}"))
+    return arrays
+
+
+def export_numpy(classifier, path):
+    """Write the classifier as a plain .npz array file for NumpyClassifier"""
+    np.savez(path, **classifier_arrays(classifier))
+
+
+def classifier_core(arrays):
+    """
+    torch module of the classifier core, built from classifier_arrays():
+    (ids [B, T], lengths [B]) -> probabilities [B, C].
+    It pads instead of packing sequences, so it scripts and exports to
+    ONNX with dynamic batch and sequence axes.
+    """
+    import torch
+
+    class ClassifierCore(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            embedding = torch.from_numpy(arrays["embedding"])
+            hidden_size = arrays["forward_w_hh"].shape[1]
+            self.embedding = torch.nn.Embedding.from_pretrained(embedding)
+            self.reprojection = torch.nn.Linear(embedding.shape[1], arrays["reproj_w"].shape[0])
+            self.forward_rnn = torch.nn.GRU(self.reprojection.out_features, hidden_size, batch_first=True)
+            self.backward_rnn = torch.nn.GRU(self.reprojection.out_features, hidden_size, batch_first=True)
+            self.decoder = torch.nn.Linear(4 * hidden_size, len(arrays["labels"]))
+
+            with torch.no_grad():
+                self.reprojection.weight.copy_(torch.from_numpy(arrays["reproj_w"]))
+                self.reprojection.bias.copy_(torch.from_numpy(arrays["reproj_b"]))
+                for direction, rnn in (("forward", self.forward_rnn), ("backward", self.backward_rnn)):
+                    rnn.weight_ih_l0.copy_(torch.from_numpy(arrays[f"{direction}_w_ih"]))
+                    rnn.weight_hh_l0.copy_(torch.from_numpy(arrays[f"{direction}_w_hh"]))
+                    rnn.bias_ih_l0.copy_(torch.from_numpy(arrays[f"{direction}_b_ih"]))
+                    rnn.bias_hh_l0.copy_(torch.from_numpy(arrays[f"{direction}_b_hh"]))
+                self.decoder.weight.copy_(torch.from_numpy(arrays["decoder_w"]))
+                self.decoder.bias.copy_(torch.from_numpy(arrays["decoder_b"]))
+
+        def forward(self, ids, lengths):
+            x = self.reprojection(self.embedding(ids))
+            steps = torch.arange(ids.size(1), device=ids.device).unsqueeze(0)
+            lengths = lengths.unsqueeze(1)
+
+            # The backward GRU reads each name reversed in place, with the
+            # padding kept at the end, so no step depends on padding
+            reverse = torch.where(steps < lengths, lengths - 1 - steps, steps)
+            x_reversed = torch.gather(x, 1, reverse.unsqueeze(2).expand(-1, -1, x.size(2)))
+            forward_out, _ = self.forward_rnn(x)
+            backward_out, _ = self.backward_rnn(x_reversed)
+
+            # Same layout as flair's DocumentRNNEmbeddings:
+            # [output at first char, output at last char], both directions each
+            last = (lengths - 1).unsqueeze(2).expand(-1, -1, forward_out.size(2))
+            features = torch.cat([
+                forward_out[:, 0], torch.gather(backward_out, 1, last).squeeze(1),
+                torch.gather(forward_out, 1, last).squeeze(1), backward_out[:, 0],
+            ], dim=1)
+            return torch.softmax(self.decoder(features), dim=1)
+
+    return ClassifierCore().eval()
+
+
+def export_torchscript(classifier, path):
+    """Write the classifier core as a scripted TorchScript module with its dictionaries"""
+    from name2nat.backends import TorchClassifier
+
+    TorchClassifier.from_flair(classifier).save(path)
+
+
+def export_onnx(classifier, path):
+    """Write the classifier core as an ONNX graph with dynamic batch and sequence axes"""
+    import onnx
+    import torch
+
+    arrays = classifier_arrays(classifier)
+    ids = torch.zeros((2, 5), dtype=torch.int64)
+    lengths = torch.tensor([5, 3], dtype=torch.int64)
+    torch.onnx.export(
+        classifier_core(arrays), (ids, lengths), path,
+        input_names=["ids", "lengths"],
+        output_names=["probs"],
+        dynamic_axes={"ids": {0: "batch", 1: "steps"}, "lengths": {0: "batch"}, "probs": {0: "batch"}},
+        opset_version=17,
+        dynamo=False,
+    )
+
+    # Keep the dictionaries inside the graph file
+    model = onnx.load(path)
+    onnx.helper.set_model_props(model, {
+        "chars": json.dumps(arrays["chars"].tolist()),
+        "labels": json.dumps(arrays["labels"].tolist()),
+    })
+    onnx.save(model, path)
+
+
+EXPORTERS = {
+    "numpy": (export_numpy, ".npz"),
+    "torchscript": (export_torchscript, ".torchscript"),
+    "onnx": (export_onnx, ".onnx"),
+}
+
+
+def check(model_path, export_path, backend, src, limit):
+    """Compare the exported backend against flair on the first names of src"""
+    from name2nat import Name2nat
+
+    names = open(src, "r", encoding="utf8").read().strip().splitlines()[:limit]
+    reference = Name2nat(model_path=model_path, dict_path=False)
+    exported = Name2nat(model_path=export_path, dict_path=False, backend=backend)
+    converted = [reference.convert(name) for name in names]
+    expected = np.array(reference._run_model(converted), dtype=np.float32)
+    actual = np.array(exported._run_model(converted), dtype=np.float32)
+    max_diff = float(np.abs(expected - actual).max())
+    same_top1 = float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean())
+    print(f"{len(names)} names from {src}: max abs difference {max_diff:.2e}, "
+          f"same top-1 label for {100 * same_top1:.2f}%")
+    return max_diff
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export best-model.pt for flair-free inference")
+    parser.add_argument("--model", type=str,
+                        default=os.path.join(os.path.dirname(__file__), "best-model.pt"),
+                        help="flair model to export (default: name2nat/best-model.pt)")
+    parser.add_argument("--format", type=str, choices=sorted(EXPORTERS), default="numpy",
+                        help="export format (default: numpy)")
+    parser.add_argument("--out", type=str, default=None,
+                        help="output file (default: next to the model, e.g. best-model.onnx)")
+    parser.add_argument("--check", type=str, default="nana_clean/country/dev.src",
+                        help="compare the export against flair on these names "
+                             "(default: nana_clean/country/dev.src, '' to skip)")
+    parser.add_argument("--check-limit", type=int, default=10000,
+                        help="number of names to compare (default: 10000)")
+    hp = parser.parse_args()
+
+    from flair.models import TextClassifier
+
+    classifier = TextClassifier.load(hp.model)
+    exporter, extension = EXPORTERS[hp.format]
+    out = hp.out or os.path.splitext(hp.model)[0] + extension
+    exporter(classifier, out)
+    print(f"Wrote {out} ({os.path.getsize(out) / 2**20:.1f} MB)")
+
+    if hp.check:
+        check(hp.model, out, hp.format, hp.check, hp.check_limit)
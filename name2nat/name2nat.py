@@ -1,17 +1,190 @@
 from name2nat.fix_path import fix_path
 
 fix_path()
-from flair.models import TextClassifier
-from flair.data import Sentence
+# flair and torch are imported on first use, so that importing name2nat
+# stays cheap for code paths that never predict
+from name2nat.cache import LRUCache, SqliteCache, file_hash
+from name2nat.dictionary import NameDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import heapq
+import itertools
+import multiprocessing
 import os
+import threading
+
+# Default model file of each backend, next to this file
+MODEL_FILES = {
+    "flair": "best-model.pt",
+    "numpy": "best-model.npz",
+    "torchscript": "best-model.torchscript",
+    "onnx": "best-model.onnx",
+}
+
+
+class Predictions(list):
+    """
+    Results of Name2nat.__call__, a plain list of (name, predictions), that
+    also reports how much within-call deduplication saved
+    """
+
+    def __init__(self, results, total, unique):
+        super().__init__(results)
+        self.total = total  # names that needed the model
+        self.unique = unique  # distinct names among them after convert()
+
+    @property
+    def dedup_ratio(self):
+        """Fraction of the names that needed the model answered by an earlier duplicate"""
+        return 1 - self.unique / self.total if self.total else 0.0
 
 
 class Name2nat:
-    def __init__(self):
-        # Load model
-        self.classifier = TextClassifier.load(
-            os.path.join(os.path.dirname(__file__), "best-model.pt")
-        )
+    def __init__(self, dict_path=None, cache_size=0, cache_path=None, model_path=None,
+                 lazy=False, backend="flair", quantize=None, executor="thread", max_wait=0.005):
+        """
+        Args:
+            dict_path: Name dictionary built by `python -m name2nat.dictionary`.
+                Defaults to name2nats.idx next to the model; the dictionary
+                is skipped if that file does not exist.
+            cache_size: Keep the probabilities of up to this many recently
+                predicted names in memory (0 disables the cache)
+            cache_path: SQLite file that persists predictions across
+                processes and runs, keyed by a hash of the model file
+            model_path: Model to load. Defaults to the backend's file in
+                MODEL_FILES next to this file.
+            lazy: Defer importing flair and loading the model until the
+                first prediction or an explicit warmup()
+            backend: "flair" runs the flair TextClassifier. "numpy",
+                "torchscript" and "onnx" run an export made by
+                `python -m name2nat.export` without unpickling flair:
+                "numpy" needs only NumPy, "torchscript" torch and "onnx"
+                onnxruntime.
+            quantize: "int8" dynamically quantizes the GRU and Linear layers
+                of the flair model for faster CPU inference. A quantized
+                model saved with save_quantized() is loaded instead when it
+                is newer than the model.
+            executor: Where apredict() and apredict_many() run the model.
+                "thread" uses a dedicated inference thread sharing this
+                instance, "process" a dedicated worker process with its own
+                copy of the model, started with spawn so it inherits no
+                torch thread pool. Any other concurrent.futures.Executor
+                runs this instance as given, so it should run threads.
+            max_wait: Seconds an async batch waits for more concurrent
+                callers after its first name before it runs
+        """
+        if backend not in MODEL_FILES:
+            raise ValueError(f"backend must be one of {sorted(MODEL_FILES)}, got {backend!r}")
+        if quantize not in (None, "int8"):
+            raise ValueError(f"quantize must be None or 'int8', got {quantize!r}")
+        if quantize and backend != "flair":
+            raise ValueError("quantize is only supported with the flair backend")
+        if not isinstance(executor, Executor) and executor not in ("thread", "process"):
+            raise ValueError(f"executor must be 'thread', 'process' or an Executor, got {executor!r}")
+        if model_path is None:
+            model_path = os.path.join(os.path.dirname(__file__), MODEL_FILES[backend])
+        self.backend = backend
+        self.quantize = quantize
+        self.model_path = model_path
+        self.cache_path = cache_path
+        self._classifier = None
+        self._heads = {}
+        self._load_lock = threading.Lock()
+        self.labels = None
+        self.label_index = None
+
+        # Prediction caches, checked in order. The disk cache is keyed by
+        # the model hash and opened together with the model.
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.disk_cache = None
+
+        # Memory-map the Wikipedia name dictionary
+        if dict_path is None:
+            dict_path = os.path.join(os.path.dirname(__file__), "name2nats.idx")
+            if not os.path.exists(dict_path):
+                dict_path = None
+        self.dict_path = dict_path
+        self.name_dict = NameDict(dict_path) if dict_path else None
+
+        # Async callers are merged into shared batches, see apredict()
+        self.executor = executor
+        self.max_wait = max_wait
+        self._batchers = {}
+        self._own_executor = None
+
+        if not lazy:
+            self.warmup()
+
+    @property
+    def classifier(self):
+        """The backend's model (a flair TextClassifier by default), loaded on first access"""
+        if self._classifier is None:
+            self._load()
+        return self._classifier
+
+    def _load(self):
+        with self._load_lock:
+            if self._classifier is not None:
+                return
+
+            # Load model
+            if self.backend == "numpy":
+                from name2nat.numpy_backend import NumpyClassifier
+
+                classifier = NumpyClassifier.load(self.model_path)
+                self.labels = classifier.labels
+            elif self.backend == "torchscript":
+                from name2nat.backends import TorchScriptClassifier
+
+                classifier = TorchScriptClassifier.load(self.model_path)
+                self.labels = classifier.labels
+            elif self.backend == "onnx":
+                from name2nat.backends import OnnxClassifier
+
+                classifier = OnnxClassifier.load(self.model_path)
+                self.labels = classifier.labels
+            elif self.quantize:
+                classifier = self._load_quantized()
+                self.labels = classifier.labels
+            else:
+                from flair.models import TextClassifier
+
+                classifier = TextClassifier.load(self.model_path)
+                self.labels = classifier.label_dictionary.get_items()
+            self.label_index = {label: i for i, label in enumerate(self.labels)}
+            if self.cache_path:
+                model_hash = file_hash(self.model_path)
+                if self.quantize:
+                    model_hash += f"-{self.quantize}"
+                self.disk_cache = SqliteCache(self.cache_path, model_hash)
+            self._classifier = classifier
+
+    @property
+    def quantized_path(self):
+        """Where save_quantized() stores the quantized model, next to the model"""
+        return os.path.splitext(self.model_path)[0] + f".{self.quantize}.torchscript"
+
+    def _load_quantized(self):
+        from name2nat.backends import TorchClassifier, TorchScriptClassifier
+
+        path = self.quantized_path
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.model_path):
+            return TorchScriptClassifier.load(path)
+
+        from flair.models import TextClassifier
+
+        return TorchClassifier.from_flair(TextClassifier.load(self.model_path), quantize=self.quantize)
+
+    def save_quantized(self, path=None):
+        """Save the quantized model as TorchScript, by default to quantized_path"""
+        if not self.quantize:
+            raise ValueError("save_quantized() needs Name2nat(quantize='int8')")
+        path = path or self.quantized_path
+        self.classifier.save(path)
+        return path
+
+    def warmup(self):
+        """Load the model and run one prediction, so the first real call is fast"""
+        self._run_model([self.convert("Name2nat")])
 
     def convert(self, name):
         name = name.replace(" ", "▁")
@@ -22,36 +195,339 @@ class Name2nat:
         return name.replace(" ", "").replace("▁", " ")
 
     def get_top_n_results(self, sentence, top_n):
-        results = sentence.labels
-        results = [(each.value, each.score) for each in results]
-        results = sorted(results, key=lambda x: x[1], reverse=True)
-        results = results[:top_n]
-        return results
+        results = heapq.nlargest(top_n, sentence.labels, key=lambda each: each.score)
+        return [(each.value, each.score) for each in results]
 
-    def __call__(self, names, top_n=5):
+    def __call__(self, names, top_n=5, batch_size=256, use_dict=True, allowed_labels=None):
         """
         Predict nationality for each name.
         Args:
             names: A list of names
             top_n: Number of predictions to return
+            batch_size: Number of names per forward pass. Flair sorts the
+                sentences by length before batching, so each mini-batch is
+                padded to names of similar length only.
+            use_dict: Answer names found in the Wikipedia name dictionary
+                with their label and a probability of 1.0 instead of
+                running the model
+            allowed_labels: Only score these labels. The model's decoder is
+                cut down to their rows, and the probabilities are
+                renormalized over them. Restricted predictions bypass the
+                prediction caches.
+        Returns:
+            A Predictions list of (name, [(label, probability), ...]).
+            Names that are equal after convert() are predicted once, and
+            its dedup_ratio tells how many predictions that saved.
         """
         if not isinstance(names, list):
             names = [names]
 
-        results = []
-        for name in names:
+        label_ids = self._label_ids(allowed_labels)
+        labels = self.labels if label_ids is None else [self.labels[i] for i in label_ids]
+        results = [None] * len(names)
+        model_inputs = []
+        for i, name in enumerate(names):
+            label = self.name_dict.get(name) if use_dict and self.name_dict is not None else None
+            if label_ids is not None and label not in labels:
+                label = None
             # Convert name format
-            name = name.replace(" ", "▁")
-            name = " ".join(char for char in name)
-
-            # Get model predictions
-            sentence = Sentence(name)
-            self.classifier.predict(sentence, return_probabilities_for_all_classes=True)
-            probs = sentence.get_labels()
-            # Get top N predictions
-            top_preds = sorted(
-                [(l.value, l.score) for l in probs], key=lambda x: x[1], reverse=True
-            )[:top_n]
-            results.append((name, top_preds))
+            name = self.convert(name)
+            if label is not None:
+                results[i] = (name, [(label, 1.0)])
+            else:
+                model_inputs.append((i, name))
+
+        probs = self._predict_probs([name for _, name in model_inputs], batch_size, label_ids)
+        # Get top N predictions
+        for (i, name), predictions in zip(model_inputs, self._top_n(probs, top_n, labels)):
+            results[i] = (name, predictions)
+
+        predicted = [name for _, name in model_inputs if name.strip()]
+        return Predictions(results, len(predicted), len(set(predicted)))
+
+    def predict_matrix(self, names, batch_size=256, use_dict=False, allowed_labels=None):
+        """
+        Probabilities of all labels for each name, filled directly from the
+        batched forward passes without per-name Python objects.
+        Args:
+            names: A list of names
+            batch_size: Number of names per forward pass
+            use_dict: Give names found in the Wikipedia name dictionary a
+                probability of 1.0 for their label instead of running the model
+            allowed_labels: Only score these labels, see __call__
+        Returns:
+            (probs, labels): an N x C float32 matrix and the C labels of its
+            columns, in label dictionary order (allowed_labels order if given). Names without characters
+            get a row of zeros. See name2nat.columnar for Arrow/Parquet.
+        """
+        import numpy as np
+
+        if not isinstance(names, list):
+            names = [names]
+        self.classifier  # the labels are known once the model is loaded
+        label_ids = self._label_ids(allowed_labels)
+        labels = self.labels if label_ids is None else [self.labels[i] for i in label_ids]
+        label_index = {label: i for i, label in enumerate(labels)}
+        probs = np.zeros((len(names), len(labels)), dtype=np.float32)
+        rows = []
+        model_inputs = []
+        for i, name in enumerate(names):
+            label = self.name_dict.get(name) if use_dict and self.name_dict is not None else None
+            if label in label_index:
+                probs[i, label_index[label]] = 1.0
+                continue
+            name = self.convert(name)
+            if name.strip():
+                rows.append(i)
+                model_inputs.append(name)
+
+        if model_inputs:
+            # Predict each distinct name once and fan the rows back out
+            unique_index = {}
+            inverse = [unique_index.setdefault(name, len(unique_index)) for name in model_inputs]
+            unique = list(unique_index)
+            if label_ids is not None or (self.cache is None and self.disk_cache is None):
+                unique_probs = self._run_model(unique, batch_size, label_ids)
+            else:
+                unique_probs = np.stack(self._predict_probs(unique, batch_size))
+            probs[rows] = unique_probs[inverse]
+        return probs, np.array(labels)
+
+    def predict_column(self, source, column="name", output=None, top_n=5, batch_size=256,
+                       use_dict=True, chunk_size=65536, verbose=True):
+        """
+        Score a column of names chunk by chunk and add label_1, prob_1, ...,
+        label_N, prob_N columns with the top N predictions.
+        Args:
+            source: A pandas DataFrame, or the path of a Parquet file whose
+                record batches are streamed, so memory stays bounded
+            column: Column holding the names
+            output: Parquet file to write when source is a Parquet file
+            top_n: Number of predictions to return
+            batch_size: Number of names per forward pass
+            use_dict: See __call__
+            chunk_size: Rows read and scored at a time. Each distinct name
+                of a chunk is predicted once.
+            verbose: Print rows, distinct names and names/sec at the end
+        Returns:
+            A scored copy of the DataFrame, or the output path
+        """
+        from name2nat.columnar import predict_column
+
+        return predict_column(self, source, column, output, top_n, batch_size, use_dict, chunk_size, verbose)
+
+    def iter_predict(self, names, top_n=5, batch_size=256, use_dict=True, chunk_size=4096,
+                     allowed_labels=None):
+        """
+        Lazily predict nationality for each name of an iterable, e.g. a
+        file handle or a DB cursor, yielding the same (name, predictions)
+        tuples as __call__ in input order.
+        Args:
+            names: Any iterable of names; it is consumed chunk by chunk
+            top_n: Number of predictions to return
+            batch_size: Number of names per forward pass
+            use_dict: See __call__
+            chunk_size: Number of names pulled from the iterable and
+                predicted at a time. Bounds memory use; larger chunks
+                let more names of similar length share a batch.
+            allowed_labels: Only score these labels, see __call__
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        iterator = iter(names)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield from self(chunk, top_n=top_n, batch_size=batch_size, use_dict=use_dict,
+                            allowed_labels=allowed_labels)
+
+    def _get_batcher(self, batch_size):
+        """The MicroBatcher merging async callers into batches of batch_size names"""
+        if batch_size not in self._batchers:
+            # asyncio is only imported by callers that use it
+            from name2nat.batching import MicroBatcher
+
+            if self._own_executor is None and self.executor == "thread":
+                self._own_executor = ThreadPoolExecutor(1, thread_name_prefix="name2nat")
+            elif self._own_executor is None and self.executor == "process":
+                # Spawned, not forked: this process may already have run torch,
+                # whose OpenMP pool does not survive a fork; the worker
+                # rebuilds the model from _worker_kwargs() anyway
+                self._own_executor = ProcessPoolExecutor(
+                    1, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker, initargs=(self._worker_kwargs(),)
+                )
+            # A worker process predicts with its own copy of this instance
+            predict = _worker_predict if self.executor == "process" else self
+            self._batchers[batch_size] = MicroBatcher(
+                predict, max_batch_size=batch_size, max_wait=self.max_wait,
+                executor=self._own_executor or self.executor,
+            )
+        return self._batchers[batch_size]
+
+    def _worker_kwargs(self):
+        """Arguments that rebuild this instance in an inference worker process"""
+        return {
+            "dict_path": self.dict_path or False,
+            "cache_size": self.cache.maxsize if self.cache is not None else 0,
+            "cache_path": self.cache_path,
+            "model_path": self.model_path,
+            "backend": self.backend,
+            "quantize": self.quantize,
+        }
+
+    async def apredict(self, name, top_n=5, batch_size=256, use_dict=True):
+        """
+        Predict nationality for one name without blocking the event loop.
+        Concurrent apredict() and apredict_many() calls are merged into
+        shared batches of up to batch_size names that run in the executor.
+        Returns a (name, [(label, score), ...]) tuple.
+        """
+        return (await self.apredict_many([name], top_n, batch_size, use_dict))[0]
+
+    async def apredict_many(self, names, top_n=5, batch_size=256, use_dict=True):
+        """Async __call__: predictions for a list of names, see apredict()"""
+        return await self._get_batcher(batch_size).predict(list(names), top_n=top_n, use_dict=use_dict)
+
+    async def aclose(self):
+        """Stop the async batcher and shut down the executor it created"""
+        for batcher in self._batchers.values():
+            await batcher.close()
+        self._batchers = {}
+        if self._own_executor is not None:
+            self._own_executor.shutdown(wait=False)
+            self._own_executor = None
+
+    def _label_ids(self, allowed_labels):
+        """Label dictionary indices of allowed_labels, None for all labels"""
+        if allowed_labels is None:
+            return None
+        if isinstance(allowed_labels, str):
+            allowed_labels = [allowed_labels]
+        self.classifier  # the labels are known once the model is loaded
+        unknown = [label for label in allowed_labels if label not in self.label_index]
+        if unknown:
+            raise ValueError(f"unknown labels: {unknown}")
+        label_ids = list(dict.fromkeys(self.label_index[label] for label in allowed_labels))
+        if not label_ids:
+            raise ValueError("allowed_labels must not be empty")
+        return label_ids
+
+    def _top_n(self, vectors, top_n, labels=None):
+        """
+        Top N (label, probability) pairs of each probability vector ([] for
+        None), from one batched top-k over all of them. labels name the
+        vector entries, the label dictionary by default.
+        """
+        from name2nat.backends import top_k
 
+        labels = labels or self.labels
+        present = [vector for vector in vectors if vector is not None]
+        indices, scores = top_k(present, top_n)
+        ranked = iter(zip(indices, scores))
+        results = []
+        for vector in vectors:
+            if vector is None:
+                results.append([])
+                continue
+            row_indices, row_scores = next(ranked)
+            results.append([(labels[i], score) for i, score in zip(row_indices, row_scores)])
         return results
+
+    def _predict_probs(self, names, batch_size=256, label_ids=None):
+        """
+        Probabilities of all labels, in label dictionary order, for each
+        converted name (None for names without characters).
+        Cached names are served from the cache; only misses reach the model,
+        each distinct name once. The caches hold full distributions, so
+        restricted label_ids always run the model.
+        """
+        if not names:
+            return []
+        if label_ids is not None:
+            unique = list(dict.fromkeys(name for name in names if name.strip()))
+            predicted = dict(zip(unique, self._run_model(unique, batch_size, label_ids)))
+            return [predicted.get(name) for name in names]
+        caches = [cache for cache in (self.cache, self.disk_cache) if cache is not None]
+        cached = {}
+        lookups = list(dict.fromkeys(name for name in names if name.strip()))
+        for level, cache in enumerate(caches):
+            found = cache.get_many(lookups)
+            # Promote hits into the faster caches in front of this one
+            for faster_cache in caches[:level]:
+                faster_cache.put_many(found)
+            cached.update(found)
+            lookups = [name for name in lookups if name not in found]
+        misses = [name for name in lookups if name not in cached]
+
+        predicted = dict(zip(misses, self._run_model(misses, batch_size)))
+        if predicted and caches:
+            # Copy the rows, so cached vectors do not keep whole batches alive
+            copies = {name: vector.copy() for name, vector in predicted.items()}
+            for cache in caches:
+                cache.put_many(copies)
+        return [predicted[name] if name in predicted else cached.get(name) for name in names]
+
+    def _run_model(self, names, batch_size=256, label_ids=None):
+        """
+        N x C float32 probabilities of converted, non-empty names from the
+        backend, or N x K renormalized over the K labels of label_ids
+        """
+        if not names:
+            return []
+        classifier = self.classifier
+        if self.backend != "flair" or self.quantize:
+            return classifier.predict_proba(names, batch_size, label_ids=label_ids)
+
+        import numpy as np
+        import torch
+        from flair.data import Sentence
+
+        # Same length-sorted mini-batches as flair's predict(), but the
+        # decoder scores are kept as one tensor per batch instead of being
+        # turned into a Label object per class and sentence
+        sentences = [Sentence(name) for name in names]
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]), reverse=True)
+        decoder_weight, decoder_bias = self._flair_head(label_ids)
+        probs = np.zeros((len(names), len(decoder_bias)), dtype=np.float32)
+        embedding_names = classifier.embeddings.get_names()
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                batch_sentences = [sentences[i] for i in batch]
+                classifier.embeddings.embed(batch_sentences)
+                embedded = torch.stack([sentence.get_embedding(embedding_names) for sentence in batch_sentences])
+                scores = torch.nn.functional.linear(embedded, decoder_weight, decoder_bias)
+                scores = torch.sigmoid(scores) if classifier.multi_label else torch.softmax(scores, dim=-1)
+                probs[batch] = scores.float().cpu().numpy()
+                for sentence in batch_sentences:
+                    sentence.clear_embeddings()
+        return probs
+
+    def _flair_head(self, label_ids):
+        """Weight and bias of the flair decoder, cut to the label_ids rows once per label set"""
+        decoder = self.classifier.decoder
+        if label_ids is None:
+            return decoder.weight, decoder.bias
+        key = tuple(label_ids)
+        if key not in self._heads:
+            import torch
+
+            with torch.no_grad():
+                rows = torch.tensor(label_ids, device=decoder.weight.device)
+                self._heads[key] = (decoder.weight[rows].clone(), decoder.bias[rows].clone())
+        return self._heads[key]
+
+
+# Model of an executor="process" inference worker
+_worker_name2nat = None
+
+
+def _init_worker(kwargs):
+    global _worker_name2nat
+    _worker_name2nat = Name2nat(**kwargs)
+
+
+def _worker_predict(names, **kwargs):
+    return _worker_name2nat(names, **kwargs)
@@ -0,0 +1,106 @@
+"""Flair-free inference with NumPy.
+
+Runs the forward pass of the exported classifier (see name2nat.export):
+one-hot character embedding -> reprojection -> bidirectional GRU ->
+linear decoder -> softmax, batched over names of similar length.
+
+The input is one character id per step, so embedding, reprojection and
+the GRU input-to-hidden projection give a fixed vector per character.
+They are folded into one vocabulary x 3H gate table per direction at
+load time, and a step only gathers its row and computes the recurrent
+hidden-to-hidden part.
+"""
+import numpy as np
+
+from name2nat.backends import CharClassifier
+
+
+def sigmoid(x):
+    # tanh form does not overflow for large negative inputs
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class NumpyClassifier(CharClassifier):
+    def __init__(self, arrays):
+        super().__init__(arrays["chars"], arrays["labels"])
+        # Embedding -> reprojection of every character in the vocabulary
+        projected = arrays["embedding"] @ arrays["reproj_w"].T + arrays["reproj_b"]
+        self.forward_gru = self.fold(projected, arrays, "forward")
+        self.backward_gru = self.fold(projected, arrays, "backward")
+        self.decoder_w = arrays["decoder_w"]
+        self.decoder_b = arrays["decoder_b"]
+        # Decoder rows of restricted label sets, sliced once per set
+        self.heads = {}
+
+    @staticmethod
+    def fold(projected, arrays, direction):
+        """(input gate table, w_hh, b_hh) of one GRU direction"""
+        gate_table = projected @ arrays[f"{direction}_w_ih"].T + arrays[f"{direction}_b_ih"]
+        return (
+            np.ascontiguousarray(gate_table, dtype=np.float32),
+            arrays[f"{direction}_w_hh"],
+            arrays[f"{direction}_b_hh"],
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls({key: arrays[key] for key in arrays.files})
+
+    def head(self, label_ids):
+        """Decoder weights and bias of the label_ids rows only"""
+        if label_ids is None:
+            return self.decoder_w, self.decoder_b
+        key = tuple(label_ids)
+        if key not in self.heads:
+            self.heads[key] = (
+                np.ascontiguousarray(self.decoder_w[label_ids]),
+                np.ascontiguousarray(self.decoder_b[label_ids]),
+            )
+        return self.heads[key]
+
+    def forward(self, ids, lengths, label_ids=None):
+        rows = np.arange(len(ids))
+        steps = np.arange(ids.shape[1])
+
+        # The backward GRU reads each name reversed in place, with the
+        # padding kept at the end, so no step depends on padding
+        reverse = np.where(steps < lengths[:, None], lengths[:, None] - 1 - steps, steps)
+        forward_out = self.gru(ids, *self.forward_gru)
+        backward_out = self.gru(ids[rows[:, None], reverse], *self.backward_gru)
+
+        # Same layout as flair's DocumentRNNEmbeddings:
+        # [output at first char, output at last char], both directions each
+        last = lengths - 1
+        features = np.concatenate([
+            forward_out[:, 0], backward_out[rows, last],
+            forward_out[rows, last], backward_out[:, 0],
+        ], axis=1)
+        # Softmax over the restricted logits is the renormalized distribution
+        decoder_w, decoder_b = self.head(label_ids)
+        return softmax(features @ decoder_w.T + decoder_b)
+
+    @staticmethod
+    def gru(ids, gate_table, w_hh, b_hh):
+        """Outputs of a single-direction GRU at every step (PyTorch gate order r, z, n)"""
+        batch_size, steps = ids.shape
+        hidden_size = w_hh.shape[1]
+        # Input gates of all steps are a single gather from the folded table,
+        # laid out step-major so each step reads a contiguous block
+        gates_x = gate_table[ids.T]
+        h = np.zeros((batch_size, hidden_size), dtype=gate_table.dtype)
+        outputs = np.empty((batch_size, steps, hidden_size), dtype=gate_table.dtype)
+        for t in range(steps):
+            gates_h = h @ w_hh.T + b_hh
+            r = sigmoid(gates_x[t, :, :hidden_size] + gates_h[:, :hidden_size])
+            z = sigmoid(gates_x[t, :, hidden_size:2 * hidden_size] + gates_h[:, hidden_size:2 * hidden_size])
+            n = np.tanh(gates_x[t, :, 2 * hidden_size:] + r * gates_h[:, 2 * hidden_size:])
+            h = (1.0 - z) * n + z * h
+            outputs[:, t] = h
+        return outputs
@@ -0,0 +1,77 @@
+"""A pool of Name2nat replicas for concurrent inference from many threads."""
+import contextlib
+import os
+import queue
+import sys
+
+from name2nat.name2nat import Name2nat
+
+
+class Name2natPool:
+    """
+    N independent Name2nat replicas behind a checkout queue. A replica is
+    used by one thread at a time, so no model or flair Sentence state is
+    shared between threads, and each checkout runs torch with
+    threads_per_replica intra-op threads, so that replicas x threads
+    does not oversubscribe the CPU.
+
+        pool = Name2natPool(replicas=4)
+        with pool.checkout() as my_name2nat:
+            results = my_name2nat(names)
+    """
+
+    def __init__(self, replicas=2, threads_per_replica=None, interop_threads=None, **kwargs):
+        """
+        Args:
+            replicas: Number of Name2nat instances
+            threads_per_replica: torch intra-op threads while a replica
+                predicts. Defaults to the CPU count divided by replicas.
+            interop_threads: torch inter-op threads of the process; it can
+                only be set before torch runs anything in parallel
+            kwargs: Passed to every Name2nat replica
+        """
+        if replicas <= 0:
+            raise ValueError("replicas must be positive")
+        if threads_per_replica is None:
+            threads_per_replica = max(1, (os.cpu_count() or 1) // replicas)
+        self.threads_per_replica = threads_per_replica
+        if interop_threads is not None:
+            import torch
+
+            torch.set_num_interop_threads(interop_threads)
+
+        self.replicas = [Name2nat(**kwargs) for _ in range(replicas)]
+        self._idle = queue.Queue()
+        for replica in self.replicas:
+            self._idle.put(replica)
+
+    def __len__(self):
+        return len(self.replicas)
+
+    @contextlib.contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an idle replica for the calling thread, waiting up to timeout seconds"""
+        try:
+            replica = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no idle Name2nat replica within {timeout} seconds") from None
+        try:
+            # torch keeps the intra-op thread count per calling thread
+            # (OpenMP), so set it for this thread before every use
+            if "torch" in sys.modules:
+                sys.modules["torch"].set_num_threads(self.threads_per_replica)
+            yield replica
+        finally:
+            self._idle.put(replica)
+
+    def __call__(self, names, **kwargs):
+        """Name2nat.__call__ on the next idle replica"""
+        with self.checkout() as replica:
+            return replica(names, **kwargs)
+
+    def warmup(self):
+        """Load and warm up every replica, e.g. after Name2natPool(lazy=True)"""
+        # The queue is FIFO, so consecutive checkouts visit every replica
+        for _ in self.replicas:
+            with self.checkout() as replica:
+                replica.warmup()
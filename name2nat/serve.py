@@ -0,0 +1,180 @@
+"""Local HTTP prediction server with dynamic micro-batching.
+
+    python -m name2nat.serve --port 8000 --max-batch-size 256 --max-wait-ms 5
+
+    curl -d '{"name": "Kyubyong Park"}' localhost:8000/predict
+    curl -d '{"names": ["Moon Jae-in", "Jing Xu"], "top_n": 3}' localhost:8000/predict
+    curl localhost:8000/stats
+
+Concurrent requests are queued and coalesced into shared forward passes
+(see name2nat.batching). Only the Python standard library is used for
+the server, and it binds to localhost unless told otherwise.
+"""
+import argparse
+import asyncio
+import json
+
+from name2nat.batching import MicroBatcher
+
+MAX_BODY_SIZE = 16 * 2**20
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Server:
+    """
+    POST /predict  {"name": str} or {"names": [str, ...]}, optional "top_n" and "use_dict"
+    GET  /stats    request latency percentiles and batch size histogram
+    GET  /health
+    """
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    status, payload = 200, await self.route(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if path == "/predict":
+            if method != "POST":
+                raise HTTPError(405, "use POST")
+            return await self.predict(body)
+        if path in ("/stats", "/health"):
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return self.batcher.stats() if path == "/stats" else {"status": "ok"}
+        raise HTTPError(404, f"no route {path}")
+
+    async def predict(self, body):
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body must be JSON")
+        if not isinstance(request, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        if "names" in request:
+            names = request["names"]
+        elif "name" in request:
+            names = [request["name"]]
+        else:
+            raise HTTPError(400, "give 'name' or 'names'")
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise HTTPError(400, "'names' must be a list of strings")
+        top_n = request.get("top_n", 5)
+        # JSON true and false are Python bools, which are ints too
+        if not isinstance(top_n, int) or isinstance(top_n, bool) or top_n <= 0:
+            raise HTTPError(400, "'top_n' must be a positive integer")
+        use_dict = request.get("use_dict", True)
+        if not isinstance(use_dict, bool):
+            raise HTTPError(400, "'use_dict' must be true or false")
+
+        results = await self.batcher.predict(names, top_n=top_n, use_dict=use_dict)
+        return {"results": [
+            {"name": name, "predictions": [[label, score] for label, score in predictions]}
+            for name, (_, predictions) in zip(names, results)
+        ]}
+
+
+async def read_request(reader):
+    """(method, path, headers, body) of the next request, None once the client is done"""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, path, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "bad Content-Length")
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, f"body larger than {MAX_BODY_SIZE} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf8")
+    head = (
+        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+
+async def serve(name2nat, host="127.0.0.1", port=8000, max_batch_size=256, max_wait=0.005):
+    batcher = MicroBatcher(name2nat, max_batch_size=max_batch_size, max_wait=max_wait)
+    server = await asyncio.start_server(Server(batcher).handle_connection, host, port)
+    print(f"Serving name2nat on http://{host}:{port} "
+          f"(max batch size {max_batch_size}, max wait {1000 * max_wait:g} ms)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve name2nat predictions over local HTTP")
+    parser.add_argument("--host", type=str, default="127.0.0.1",
+                        help="address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="port to listen on (default: 8000)")
+    parser.add_argument("--max-batch-size", type=int, default=256,
+                        help="most names per coalesced batch (default: 256)")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="longest a batch waits for more names after its first one (default: 5)")
+    parser.add_argument("--backend", type=str, default="flair",
+                        help="flair, numpy, torchscript or onnx (default: flair)")
+    parser.add_argument("--model", type=str, default=None,
+                        help="model file (default: the backend's model next to the package)")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="names kept in the in-memory LRU prediction cache (default: 0)")
+    hp = parser.parse_args()
+
+    from name2nat import Name2nat
+
+    my_name2nat = Name2nat(model_path=hp.model, backend=hp.backend, cache_size=hp.cache_size)
+    try:
+        asyncio.run(serve(my_name2nat, hp.host, hp.port, hp.max_batch_size, hp.max_wait_ms / 1000))
+    except KeyboardInterrupt:
+        pass
@@ -1,10 +1,25 @@
 import name2nat
 from name2nat import Name2nat
+from name2nat.cache import SqliteCache
 import torch
 import os
 import inspect
+import argparse
+import multiprocessing
+import time
 from datetime import datetime
 
+parser = argparse.ArgumentParser()
+parser.add_argument("--cache", type=str, default="resources/predict_cache.sqlite",
+                    help="SQLite prediction cache shared across runs "
+                         "(default: resources/predict_cache.sqlite)")
+parser.add_argument("--no-cache", action="store_true",
+                    help="Predict every name with the model")
+parser.add_argument("--workers", type=int, default=1,
+                    help="Shard the names across this many forked processes "
+                         "that share the loaded model copy-on-write (default: 1)")
+hp = parser.parse_args()
+
 # Print where Name2nat is looking for the model
 print("Name2nat package location:", os.path.dirname(name2nat.__file__))
 
@@ -36,21 +51,67 @@ if os.path.exists(name2nat_init):
 # Copy or move the new model to where Name2nat expects it
 print(f"Found model at: {model_path}")
 
-my_name2nat = Name2nat()
+# With several workers, load the model before forking but do not run it,
+# so no torch thread pool is started in the parent
+my_name2nat = Name2nat(cache_path=None if hp.no_cache else hp.cache, lazy=hp.workers > 1)
 
 # Use correct path for test data
 names = open("nana_clean/country/test.src", 'r', encoding='utf8').read().splitlines()
 
-with torch.no_grad():
-    try:
-        results = my_name2nat(names, top_n=5, use_dict=False)  # type: ignore
-    except RuntimeError as e:
-        print(f"Error during prediction: {e}")
-        print("Unexpected error with PyTorch 2.5 model")
-        raise
-    
+
+def predict_shard(shard):
+    """Predict one shard of names; returns (results, worker pid, seconds, cache hits and misses)"""
+    start = time.perf_counter()
+    with torch.no_grad():
+        try:
+            results = my_name2nat(shard, top_n=5, use_dict=False)  # type: ignore
+        except RuntimeError as e:
+            print(f"Error during prediction: {e}")
+            print("Unexpected error with PyTorch 2.5 model")
+            raise
+    elapsed = time.perf_counter() - start
+    disk_cache = my_name2nat.disk_cache
+    cache_counts = (disk_cache.hits, disk_cache.misses) if disk_cache is not None else (0, 0)
+    return results, os.getpid(), elapsed, cache_counts
+
+
+def init_worker():
+    # Split the cores between the workers
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // hp.workers))
+    # SQLite connections must not be used across fork, so open our own
+    disk_cache = my_name2nat.disk_cache
+    if disk_cache is not None:
+        my_name2nat.disk_cache = SqliteCache(disk_cache.path, disk_cache.model_hash)
+
+
+start = time.perf_counter()
+if hp.workers > 1:
+    my_name2nat.classifier  # load the model, shared copy-on-write after fork
+    shard_size = -(-len(names) // hp.workers)
+    shards = [names[i:i + shard_size] for i in range(0, len(names), shard_size)]
+    with multiprocessing.get_context("fork").Pool(hp.workers, initializer=init_worker) as pool:
+        # map keeps the shards in input order
+        shard_results = pool.map(predict_shard, shards)
+    results = []
+    for shard, (shard_result, pid, elapsed, (hits, misses)) in zip(shards, shard_results):
+        results.extend(shard_result)
+        if my_name2nat.disk_cache is not None:
+            my_name2nat.disk_cache.hits += hits
+            my_name2nat.disk_cache.misses += misses
+        print(f"Worker {pid}: {len(shard)} names in {elapsed:.1f}s, {len(shard) / elapsed:.0f} names/sec")
+else:
+    results = predict_shard(names)[0]
+elapsed = time.perf_counter() - start
+print(f"Predicted {len(names)} names with {hp.workers} worker(s) in {elapsed:.1f}s, "
+      f"{len(names) / elapsed:.0f} names/sec")
+
 with open("test.pred", "w", encoding="utf8") as fout:
     for r in results:
         preds = r[-1] # type: ignore
         preds = ",".join(each[0] for each in preds)
         fout.write(preds + "\n")
+
+if my_name2nat.disk_cache is not None:
+    stats = my_name2nat.disk_cache.stats()
+    print(f"Prediction cache {stats['path']}: {stats['hits']} hits, {stats['misses']} misses, "
+          f"hit rate {100 * stats['hit_rate']:.1f}%")
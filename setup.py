@@ -12,12 +12,17 @@ setuptools.setup(
     author_email="jimmy@plero.se",
     description="Nationality Prediction from Name",
     install_requires=REQUIRED_PACKAGES,
+    extras_require={
+        "onnx": ["onnx>=1.14.0", "onnxruntime>=1.16.0"],
+        "arrow": ["pyarrow>=12.0.0"],
+    },
     license="Apache License 2.0",
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/jimmy927/name2nat",
     packages=setuptools.find_packages(),
-    package_data={"name2nat": ["name2nat/best-model.pt", "name2nat/fix_path.py"]},
+    entry_points={"console_scripts": ["name2nat=name2nat.cli:main"]},
+    package_data={"name2nat": ["name2nat/best-model.pt", "name2nat/name2nats.idx", "name2nat/fix_path.py"]},
     python_requires=">=3.6",
     include_package_data=True,
     classifiers=[
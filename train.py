@@ -1,15 +1,20 @@
 import os
 import random
 import argparse
-from flair.data import Corpus
-from flair.datasets import CSVClassificationCorpus
+import socket
+import time
+from flair.data import Corpus, Dictionary, FlairDataset, Sentence
 from flair.embeddings import OneHotEmbeddings, DocumentRNNEmbeddings
 from flair.models import TextClassifier
+from flair.samplers import FlairSampler
 from flair.trainers import ModelTrainer
 from torch.optim.lr_scheduler import ReduceLROnPlateau
 from typing import List
+import numpy as np
 import torch
+import torch.distributed as dist
 import flair
+from name2nat import corpus as corpus_cache
 
 # Update argument parser
 parser = argparse.ArgumentParser()
@@ -26,126 +31,319 @@ parser.add_argument('--mini-batch-size', type=int, default=128,
                         'Reduce this if you get out-of-memory errors.')
 parser.add_argument('--everything', action='store_true',
                    help='Train on all data (including test data) for production')
+parser.add_argument('--bucket-batches', action='store_true',
+                   help='Group names of similar length into each mini-batch to cut GRU padding; '
+                        'the grouping is reshuffled every epoch')
+parser.add_argument('--bucket-size', type=int, default=100,
+                   help='Mini-batches per length-sorted pool with --bucket-batches. Default: 100. '
+                        'Larger pools pad less but mix lengths less randomly.')
+parser.add_argument('--num-procs', type=int, default=1,
+                   help='Train data-parallel in this many CPU processes (torch.distributed, gloo). '
+                        'Each process trains on its own share of every epoch\'s mini-batches of '
+                        '--mini-batch-size names and gradients are averaged across processes. Default: 1')
+parser.add_argument('--scaling', type=int, nargs='+', default=None, metavar='N',
+                   help='Instead of training, report training samples/sec with each of these '
+                        'process counts, e.g. --scaling 1 2 4 8')
+parser.add_argument('--scaling-steps', type=int, default=100,
+                   help='Timed mini-batches per process for --scaling. Default: 100')
+parser.add_argument('--seed', type=int, default=0,
+                   help='Seed of the initial weights and batch order with --num-procs. Default: 0')
 args = parser.parse_args()
 
 os.makedirs('data', exist_ok=True)
 
-def convert(name_f, nat_f, fout_handle, sample_percentage=100.0):
-    """Convert source files to Flair format and write to output file handle"""
-    names = open(name_f, 'r', encoding='utf8').read().strip().splitlines()
-    nats = open(nat_f, 'r', encoding='utf8').read().strip().splitlines()
-    
-    print(f"\nProcessing {name_f}:")
-    print(f"Total samples available: {len(names)}")
-    
-    # If sampling is requested - apply to all files
+
+class EncodedDataset(FlairDataset):
+    """Sentences of a memory-mapped corpus split, created only when a batch needs them"""
+
+    def __init__(self, split: corpus_cache.EncodedSplit, indices):
+        self.split = split
+        self.indices = indices
+
+    def is_in_memory(self) -> bool:
+        return False
+
+    def __len__(self):
+        return len(self.indices)
+
+    def lengths(self):
+        return self.split.lengths()[self.indices]
+
+    def __getitem__(self, index: int) -> Sentence:
+        i = self.indices[index]
+        sentence = Sentence(self.split.tokens(i))
+        sentence.add_label('label', self.split.label(i))
+        return sentence
+
+
+class LengthBucketSampler(FlairSampler):
+    """Yields indices so that consecutive mini-batches hold names of similar length"""
+
+    def __init__(self, batch_size: int, bucket_size: int = 100):
+        super().__init__()
+        self.batch_size = batch_size
+        self.bucket_size = bucket_size
+        self.rng = np.random.default_rng()
+
+    def __iter__(self):
+        lengths = self.data_source.lengths()
+        batches = corpus_cache.bucket_batches(lengths, self.batch_size, self.bucket_size, self.rng)
+        # The trainer cuts this stream into runs of mini_batch_size; measure those batches
+        indices = np.concatenate(batches) if batches else np.zeros(0, dtype=np.int64)
+        shuffled = self.rng.permutation(len(lengths))
+        print(f"Padding ratio: {100 * corpus_cache.padding_ratio(lengths, indices, self.batch_size):.1f}% bucketed, "
+              f"{100 * corpus_cache.padding_ratio(lengths, shuffled, self.batch_size):.1f}% shuffled")
+        return iter(indices.tolist())
+
+
+def sample(split: corpus_cache.EncodedSplit, sample_percentage=100.0):
+    """Indices of the names to use from a split"""
+    print(f"Total samples available: {len(split)}")
     if sample_percentage < 100.0:
-        combined = list(zip(names, nats))
-        sample_size = max(int(len(combined) * sample_percentage / 100.0), 1)
-        combined = random.sample(combined, sample_size)
-        names, nats = zip(*combined)
-        print(f"Using {sample_percentage}% of data: selected {len(names)} samples")
-    else:
-        print(f"Using all {len(names)} samples")
-    
-    for name, nat in zip(names, nats):
-        # Keep Korean name handling only for train data
-        if "train" in name_f and nat == "Korean":
-            if random.random() > 0.5:
-                name = name.replace("-", "")
-            if random.random() > 0.5:
-                columns = name.split(" ", 1)
-                if len(columns)==2:
-                    last, first = columns
-                    name = first + " " + last
-        name = name.replace(" ", "▁")
-        name = " ".join(char for char in name)
-        fout_handle.write(f"{name}\t{nat}\n")
-
-# First combine train data with ODI data
+        sample_size = max(int(len(split) * sample_percentage / 100.0), 1)
+        print(f"Using {sample_percentage}% of data: selected {sample_size} samples")
+        return random.sample(range(len(split)), sample_size)
+    print(f"Using all {len(split)} samples")
+    return range(len(split))
+
+
 sample_pct = 0.1 if args.small else args.sample_pct
 
-# Write training data
-with open('data/train.txt', 'w', encoding='utf8') as fout:
-    if args.everything:
-        # Use all data for training
-        for split in ['train', 'dev', 'test']:
-            convert(f'nana_clean/country/{split}.src', 
-                   f'nana_clean/country/{split}.tgt', 
-                   fout, sample_percentage=sample_pct)
-        # Add ODI data
-        convert('nana_clean/country/odi.country.src',
-               'nana_clean/country/odi.country.tgt',
-               fout, sample_percentage=sample_pct)
-    else:
-        # Normal mode: train+dev+odi
-        convert('nana_clean/country/train.src', 'nana_clean/country/train.tgt',
-               fout, sample_percentage=sample_pct)
-        convert('nana_clean/country/odi.country.src', 'nana_clean/country/odi.country.tgt',
-               fout, sample_percentage=sample_pct)
-
-# Write dev data (also sampled)
-with open('data/dev.txt', 'w', encoding='utf8') as fout:
-    convert('nana_clean/country/dev.src', 'nana_clean/country/dev.tgt', fout,
-           sample_percentage=sample_pct)
-
-# this is the folder in which train, test and dev files reside
-data_folder = 'data'
-
-# column format indicating which columns hold the text and label(s)
-column_name_map = {0: "text", 1: "label"}
-
-# Use both files in Flair
-corpus = CSVClassificationCorpus(
-    data_folder,
-    column_name_map,
-    train_file="train.txt",
-    dev_file="dev.txt",
-    test_file=None,  # Tell Flair we handle testing separately
-    skip_header=False,
-    delimiter='\t',
-    label_type='label'
-)
+# Encode the splits into a memory-mapped corpus once; later runs reuse it
+# until an input file changes. Normal mode trains on train+odi, --everything
+# on train+dev+test+odi; dev is used for model selection either way.
+cache_dir = 'data/corpus-everything' if args.everything else 'data/corpus'
+corpus_cache.ensure(corpus_cache.training_sources('nana_clean/country', args.everything), cache_dir)
+train_split = corpus_cache.EncodedSplit(cache_dir, 'train')
+dev_split = corpus_cache.EncodedSplit(cache_dir, 'dev')
 
-stats = corpus.obtain_statistics()
-print(stats)
+print("\nTraining data:")
+train_indices = sample(train_split, sample_pct)
+print("\nDev data:")
+dev_indices = sample(dev_split, sample_pct)
 
-# create the label dictionary from all data
-label_dict = corpus.make_label_dictionary(label_type='label', add_dev_test=True)
+corpus = Corpus(
+    train=EncodedDataset(train_split, train_indices),
+    dev=EncodedDataset(dev_split, dev_indices),
+    test=None,  # Tell Flair we handle testing separately
+    sample_missing_splits=False,
+)
+
+# Dictionaries straight from the encoded vocabulary instead of a pass over
+# every Sentence: all labels, and the characters seen in training
+label_dict = Dictionary(add_unk=False)
+for label in train_split.labels:
+    label_dict.add_item(label)
 print(label_dict)
 
-# make a list of word embeddings
-embeddings: List[OneHotEmbeddings] = [OneHotEmbeddings(
-    vocab_dictionary=corpus.make_vocab_dictionary()
-)]
-
-# initialize document embedding by passing list of word embeddings
-# Can choose between many RNN types (GRU by default, to change use rnn_type parameter)
-document_embeddings = DocumentRNNEmbeddings(
-    embeddings, 
-    hidden_size=256,
-    bidirectional=True
-)
+vocab_dict = Dictionary()
+for char in train_split.used_chars():
+    vocab_dict.add_item(char)
 
-# create the text classifier
-classifier = TextClassifier(
-    document_embeddings,
-    label_dictionary=label_dict,
-    label_type='label'  # Add label_type parameter to match what we used in corpus
-)
 
-# initialize the text classifier trainer
-trainer = ModelTrainer(classifier, corpus)
-
-# start the training
-trainer.train(
-    'resources/',
-    learning_rate=0.1,
-    mini_batch_size=args.mini_batch_size,
-    max_epochs=args.max_epochs,
-    anneal_factor=0.5,
-    patience=5,
-    min_learning_rate=0.0001,
-    train_with_dev=False,
-    shuffle=True
-)
\ No newline at end of file
+def build_classifier():
+    # make a list of word embeddings
+    embeddings: List[OneHotEmbeddings] = [OneHotEmbeddings(
+        vocab_dictionary=vocab_dict
+    )]
+
+    # initialize document embedding by passing list of word embeddings
+    # Can choose between many RNN types (GRU by default, to change use rnn_type parameter)
+    document_embeddings = DocumentRNNEmbeddings(
+        embeddings,
+        hidden_size=256,
+        bidirectional=True
+    )
+
+    # create the text classifier
+    return TextClassifier(
+        document_embeddings,
+        label_dictionary=label_dict,
+        label_type='label'  # Add label_type parameter to match what we used in corpus
+    )
+
+
+def epoch_batches(dataset: EncodedDataset, epoch: int, rank: int, world_size: int):
+    """
+    This process's mini-batches of an epoch. Every process draws the same
+    seeded batches and takes every world_size-th one, so the shards are
+    disjoint and together cover the epoch.
+    """
+    rng = np.random.default_rng([args.seed, epoch])
+    if args.bucket_batches:
+        batches = corpus_cache.bucket_batches(dataset.lengths(), args.mini_batch_size, args.bucket_size, rng)
+    else:
+        order = rng.permutation(len(dataset))
+        batches = [order[i:i + args.mini_batch_size] for i in range(0, len(order), args.mini_batch_size)]
+    # Every process must take the same number of steps, or the last
+    # gradient all-reduce waits forever; at most world_size - 1 batches are left out
+    usable = len(batches) - len(batches) % world_size
+    return batches[rank:usable:world_size]
+
+
+def train_step(classifier, optimizer, parameters, sentences, world_size):
+    """One SGD step on the gradients averaged over all processes; returns (summed loss, names)"""
+    optimizer.zero_grad()
+    loss, count = classifier.forward_loss(sentences)
+    loss.backward()
+    # All-reduce the gradients as one flat tensor, one message per step
+    grads = [p.grad if p.grad is not None else torch.zeros_like(p) for p in parameters]
+    flat = torch.cat([grad.reshape(-1) for grad in grads])
+    dist.all_reduce(flat)
+    flat /= world_size
+    offset = 0
+    for p in parameters:
+        p.grad = flat[offset:offset + p.numel()].view_as(p)
+        offset += p.numel()
+    # As flair's ModelTrainer
+    torch.nn.utils.clip_grad_norm_(parameters, 5.0)
+    optimizer.step()
+    return loss.item(), count
+
+
+def dev_accuracy(classifier, dataset: EncodedDataset, rank: int, world_size: int):
+    """Accuracy on the dev set, each process predicting every world_size-th name"""
+    correct, total = 0, 0
+    positions = list(range(rank, len(dataset), world_size))
+    classifier.eval()
+    with torch.no_grad():
+        for start in range(0, len(positions), 256):
+            sentences = [dataset[i] for i in positions[start:start + 256]]
+            classifier.predict(sentences, mini_batch_size=256, label_name='predicted')
+            correct += sum(sentence.get_label('predicted').value == sentence.get_label('label').value
+                           for sentence in sentences)
+            total += len(sentences)
+    classifier.train()
+    counts = torch.tensor([correct, total], dtype=torch.float64)
+    dist.all_reduce(counts)
+    return (counts[0] / counts[1]).item() if counts[1] else 0.0
+
+
+def setup_process(rank: int, world_size: int, port: int):
+    """Join the process group and build this process's copy of the classifier"""
+    # Split the cores between the processes
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    dist.init_process_group('gloo', init_method=f'tcp://127.0.0.1:{port}', rank=rank, world_size=world_size)
+    flair.device = torch.device('cpu')
+    torch.manual_seed(args.seed)
+    classifier = build_classifier()
+    # Start every process from rank 0's weights
+    for tensor in classifier.state_dict().values():
+        dist.broadcast(tensor, 0)
+    parameters = [p for p in classifier.parameters() if p.requires_grad]
+    optimizer = torch.optim.SGD(parameters, lr=0.1)
+    return classifier, parameters, optimizer
+
+
+def train_process(rank: int, world_size: int, port: int):
+    """
+    One process of --num-procs training: SGD on its shard of each epoch,
+    gradients all-reduced every step, the learning rate halved when dev
+    accuracy has not improved for 5 epochs, as trainer.train below.
+    Only rank 0 writes to resources/.
+    """
+    classifier, parameters, optimizer = setup_process(rank, world_size, port)
+    scheduler = ReduceLROnPlateau(optimizer, mode='max', factor=0.5, patience=5)
+    best_accuracy = -1.0
+    for epoch in range(1, args.max_epochs + 1):
+        batches = epoch_batches(corpus.train, epoch, rank, world_size)
+        dist.barrier()
+        start = time.perf_counter()
+        loss_sum, samples = 0.0, 0
+        for batch in batches:
+            loss, count = train_step(classifier, optimizer, parameters,
+                                     [corpus.train[i] for i in batch.tolist()], world_size)
+            loss_sum += loss
+            samples += count
+        totals = torch.tensor([loss_sum, samples], dtype=torch.float64)
+        dist.all_reduce(totals)
+        elapsed = time.perf_counter() - start
+
+        accuracy = dev_accuracy(classifier, corpus.dev, rank, world_size)
+        lr = optimizer.param_groups[0]['lr']
+        if rank == 0:
+            print(f"Epoch {epoch}: loss {totals[0] / max(totals[1], 1):.4f}, dev accuracy {accuracy:.4f}, "
+                  f"lr {lr:.4f}, {totals[1] / elapsed:.0f} samples/sec over {world_size} processes")
+            if accuracy > best_accuracy:
+                classifier.save('resources/best-model.pt')
+                print("Saved resources/best-model.pt")
+        best_accuracy = max(best_accuracy, accuracy)
+        scheduler.step(accuracy)
+        if optimizer.param_groups[0]['lr'] < 0.0001:
+            if rank == 0:
+                print("Learning rate too small, quitting training")
+            break
+
+    if rank == 0:
+        classifier.save('resources/final-model.pt')
+    dist.barrier()
+    dist.destroy_process_group()
+
+
+def scaling_process(rank: int, world_size: int, port: int, results):
+    """Times --scaling-steps training steps per process; rank 0 puts the samples/sec in results"""
+    classifier, parameters, optimizer = setup_process(rank, world_size, port)
+    batches = epoch_batches(corpus.train, 0, rank, world_size)
+    # A few untimed steps first, e.g. for the first allocations
+    warmup = min(5, len(batches))
+    for batch in batches[:warmup]:
+        train_step(classifier, optimizer, parameters, [corpus.train[i] for i in batch.tolist()], world_size)
+    dist.barrier()
+    start = time.perf_counter()
+    samples = 0
+    for batch in batches[warmup:warmup + args.scaling_steps]:
+        _, count = train_step(classifier, optimizer, parameters,
+                              [corpus.train[i] for i in batch.tolist()], world_size)
+        samples += count
+    counts = torch.tensor([samples], dtype=torch.float64)
+    dist.all_reduce(counts)
+    if rank == 0:
+        results.put(counts.item() / (time.perf_counter() - start))
+    dist.destroy_process_group()
+
+
+def run_processes(fn, world_size: int, *fn_args):
+    """Run fn(rank, world_size, port, *fn_args) in world_size processes"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    # Forked before torch has run anything, so no thread pool is inherited;
+    # the processes share the memory-mapped corpus and the dictionaries
+    torch.multiprocessing.start_processes(fn, args=(world_size, port) + fn_args, nprocs=world_size,
+                                          start_method='fork')
+
+
+if args.scaling:
+    results = torch.multiprocessing.get_context('fork').SimpleQueue()
+    print("|Processes|Samples/sec|Speedup|Efficiency|")
+    print("|--|--|--|--|")
+    baseline = None
+    for num_procs in args.scaling:
+        run_processes(scaling_process, num_procs, results)
+        samples_per_sec = results.get()
+        baseline = baseline or samples_per_sec / num_procs
+        speedup = samples_per_sec / baseline
+        print(f"|{num_procs}|{samples_per_sec:.0f}|{speedup:.2f}x|{100 * speedup / num_procs:.0f}%|")
+elif args.num_procs > 1:
+    os.makedirs('resources', exist_ok=True)
+    run_processes(train_process, args.num_procs)
+else:
+    classifier = build_classifier()
+
+    # initialize the text classifier trainer
+    trainer = ModelTrainer(classifier, corpus)
+
+    # start the training
+    trainer.train(
+        'resources/',
+        learning_rate=0.1,
+        mini_batch_size=args.mini_batch_size,
+        max_epochs=args.max_epochs,
+        anneal_factor=0.5,
+        patience=5,
+        min_learning_rate=0.0001,
+        train_with_dev=False,
+        shuffle=True,
+        # flair ignores shuffle when a sampler is given
+        sampler=LengthBucketSampler(args.mini_batch_size, args.bucket_size) if args.bucket_batches else None,
+    )